@@ -0,0 +1,87 @@
+"""
+Simple players and a factory for every kind of player.
+
+Every player has a choose(pos) method returning a legal move, or None
+once the game is over, and a close() method. make_agent builds one from a short text spec such
+as "random", "greedy", "alphabeta:200", "mcts:1000" or "tablebase:game.tb",
+so scripts can take players from the command line.
+"""
+import random
+
+from ai import AlphaBetaPlayer, evaluate
+from mcts import MCTSPlayer
+from tablebase import Tablebase
+
+
+class RandomPlayer:
+    """Plays a uniformly random legal move."""
+
+    def __init__(self, seed=None):
+        """Seeds the move choice."""
+        self.rng = random.Random(seed)
+
+    def choose(self, pos):
+        """Returns a random legal move, or None."""
+        moves = pos.legal_moves()
+        return self.rng.choice(moves) if moves else None
+
+    def close(self):
+        """Releases nothing; players holding resources override it."""
+
+
+class GreedyPlayer(RandomPlayer):
+    """Looks one move ahead: wins at once if it can, else keeps the best open lines."""
+
+    def score(self, pos, move):
+        """Returns the value of a move for the side playing it."""
+        turn = pos.turn
+        pos.apply(move)
+        if pos.winner is None:
+            score = -evaluate(pos)
+        else:
+            score = float("inf") if pos.winner == turn else float("-inf")
+        pos.undo(move)
+        return score
+
+    def choose(self, pos):
+        """Returns one of the best moves by one-ply evaluation, or None."""
+        moves = pos.legal_moves()
+        if not moves:
+            return None
+        pos = pos.copy()
+        scores = [self.score(pos, move) for move in moves]
+        best = max(scores)
+        return self.rng.choice([move for move, score in zip(moves, scores) if score == best])
+
+
+class TablebasePlayer:
+    """Plays perfectly from a tablebase, and randomly where it has no entry."""
+
+    def __init__(self, path, seed=None):
+        """Opens the tablebase file."""
+        self.tablebase = Tablebase(path)
+        self.fallback = RandomPlayer(seed)
+
+    def choose(self, pos):
+        """Returns the tablebase move, or a random one if the position is unsolved."""
+        return self.tablebase.best_move(pos) or self.fallback.choose(pos)
+
+    def close(self):
+        """Unmaps the tablebase."""
+        self.tablebase.close()
+
+
+def make_agent(spec, seed=None):
+    """Builds a player from a spec like "alphabeta:200" (name, then an optional argument)."""
+    name, _, arg = spec.partition(":")
+    if name == "random":
+        return RandomPlayer(seed)
+    if name == "greedy":
+        return GreedyPlayer(seed)
+    if name == "alphabeta":
+        return AlphaBetaPlayer(int(arg or 1000))
+    if name == "mcts":
+        return MCTSPlayer(int(arg or 2000), seed=seed)
+    if name == "tablebase":
+        return TablebasePlayer(arg, seed)
+    raise ValueError(f"unknown player {spec!r}")
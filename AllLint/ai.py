@@ -0,0 +1,166 @@
+"""
+Alpha-beta computer player for Gobblet Jr.
+
+Searches the headless engine with iterative deepening inside a per-move
+time budget, ordering moves by transposition table, killer moves and the
+history heuristic.
+"""
+import sys
+import time
+
+import engine
+
+WIN_SCORE = 100000
+LINE_WEIGHTS = (0, 1, 10, 0)
+POPCOUNT = tuple(len(cells) for cells in engine.CELLS_OF)
+EXACT, LOWER, UPPER = 0, 1, 2
+CHECK_EVERY = 1023
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the move budget runs out."""
+
+
+def evaluate(pos):
+    """Scores a position for the side to move by its open lines."""
+    mine = pos.visible(pos.turn)
+    theirs = pos.visible(engine.other(pos.turn))
+    score = 0
+    for line in engine.LINE_MASKS:
+        own = POPCOUNT[mine & line]
+        opposing = POPCOUNT[theirs & line]
+        if not opposing:
+            score += LINE_WEIGHTS[own]
+        elif not own:
+            score -= LINE_WEIGHTS[opposing]
+    return score
+
+
+def cuts_off(flag, score, alpha, beta):
+    """Returns True if a stored bound settles the search window."""
+    return (flag == EXACT or flag == LOWER and score >= beta
+            or flag == UPPER and score <= alpha)
+
+
+class AlphaBetaPlayer:
+    """Picks moves by iterative-deepening negamax with alpha-beta pruning."""
+
+    def __init__(self, budget_ms=1000, max_depth=32, table_size=1 << 20):
+        """Sets the per-move budget in milliseconds and the depth limit."""
+        self.budget = budget_ms / 1000
+        self.max_depth = max_depth
+        self.table_size = table_size
+        self.table = {}
+        self.history = ({}, {})
+        self.killers = []
+        self.deadline = 0.0
+        self.nodes = 0
+        self.elapsed = 0.0
+
+    @property
+    def nodes_per_second(self):
+        """Returns the search speed measured over every call to choose."""
+        return self.nodes / self.elapsed if self.elapsed else 0.0
+
+    def choose(self, pos):
+        """Returns the best move found within the budget, or None."""
+        moves = pos.legal_moves()
+        if not moves:
+            return None
+        pos = pos.copy()
+        start = time.perf_counter()
+        self.deadline = start + self.budget
+        self.killers = [[None, None] for _ in range(self.max_depth + 1)]
+        if len(self.table) > self.table_size:
+            self.table.clear()
+        best = moves[0]
+        try:
+            for depth in range(1, self.max_depth + 1):
+                score = self._search(pos, depth, -WIN_SCORE - 1, WIN_SCORE + 1, 0)
+                best = self.table[pos.key()][3]
+                if abs(score) > WIN_SCORE - self.max_depth:
+                    break
+        except SearchTimeout:
+            pass
+        self.elapsed += time.perf_counter() - start
+        return best
+
+    def close(self):
+        """Frees the transposition table and move ordering statistics."""
+        self.table.clear()
+        self.history = ({}, {})
+
+    def _ordered(self, moves, tt_move, ply, turn):
+        """Orders moves: table move, then killers, then by history score."""
+        history = self.history[turn]
+        moves.sort(key=lambda move: history.get(move, 0), reverse=True)
+        front = [move for move in (tt_move, *self.killers[ply]) if move in moves]
+        for move in reversed(front):
+            moves.remove(move)
+            moves.insert(0, move)
+        return moves
+
+    def _reward(self, move, depth, ply, turn):
+        """Records a move that caused a beta cutoff."""
+        killers = self.killers[ply]
+        if move != killers[0]:
+            killers[1], killers[0] = killers[0], move
+        history = self.history[turn]
+        history[move] = history.get(move, 0) + depth * depth
+
+    def _to_table(self, score, ply):
+        """Makes win scores relative to the node before storing them."""
+        if score > WIN_SCORE - self.max_depth:
+            return score + ply
+        if score < self.max_depth - WIN_SCORE:
+            return score - ply
+        return score
+
+    def _probe(self, key, depth, ply):
+        """Returns (score, flag, move) from the table; score is None if too shallow."""
+        entry = self.table.get(key)
+        if entry is None:
+            return None, None, None
+        entry_depth, flag, score, move = entry
+        if entry_depth < depth:
+            return None, None, move
+        return self._to_table(score, -ply), flag, move
+
+    def _search(self, pos, depth, alpha, beta, ply):
+        """Returns the negamax score of a position for the side to move."""
+        self.nodes += 1
+        if not self.nodes & CHECK_EVERY and time.perf_counter() > self.deadline:
+            raise SearchTimeout
+        if pos.winner is not None:
+            return WIN_SCORE - ply if pos.winner == pos.turn else ply - WIN_SCORE
+        if not depth:
+            return evaluate(pos)
+        key = pos.key()
+        score, flag, tt_move = self._probe(key, depth, ply)
+        if ply and cuts_off(flag, score, alpha, beta):
+            return score
+        start_alpha = alpha
+        best_score, best_move = -WIN_SCORE - 1, None
+        for move in self._ordered(pos.legal_moves(), tt_move, ply, pos.turn):
+            pos.apply(move)
+            score = -self._search(pos, depth - 1, -beta, -alpha, ply + 1)
+            pos.undo(move)
+            if score > best_score:
+                best_score, best_move = score, move
+                alpha = max(alpha, score)
+                if alpha >= beta:
+                    self._reward(move, depth, ply, pos.turn)
+                    break
+        if best_score <= start_alpha:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table[key] = (depth, flag, self._to_table(best_score, ply), best_move)
+        return best_score
+
+
+if __name__ == "__main__":
+    player = AlphaBetaPlayer(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
+    print(player.choose(engine.Position()), f"{player.nodes_per_second:.0f} nodes/s")
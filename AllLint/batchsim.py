@@ -0,0 +1,162 @@
+"""
+Vectorised batch simulator for random Gobblet Jr. games.
+
+Plays N games at once with NumPy, using the engine's bitboards: every
+game is a row of six 9-bit masks, one per colour and size. A piece of
+a given size can go to exactly the cells where no piece of that size or
+larger sits, so the number of legal moves of each size is a product of
+two popcounts. Each step therefore picks a uniformly random legal move
+per game by drawing one number below the move count and decoding it
+with lookup tables. It never builds a mask of all 108 moves. Finished
+games are dropped from the working arrays, so later steps only touch the
+games still running. Requires numpy.
+"""
+import sys
+import time
+
+import numpy as np
+
+import engine
+
+EMPTY = -1
+MASKS = np.arange(engine.FULL + 1)
+# Set bits per mask, the cell of the k-th set bit, and whether a mask holds a line.
+POPCOUNT = np.array([len(cells) for cells in engine.CELLS_OF], dtype=np.int32)
+NTH_CELL = np.array([list(cells) + [0] * (9 - len(cells)) for cells in engine.CELLS_OF],
+                    dtype=np.int32)
+HAS_LINE = np.zeros(engine.FULL + 1, dtype=bool)
+for _line in engine.LINE_MASKS:
+    HAS_LINE |= MASKS & _line == _line
+
+
+class Batch:
+    """
+    N Gobblet Jr. games stored as arrays.
+
+    masks[colour * 3 + size, n] is the engine bitboard of that colour and
+    size in game ids[n], and a reserve holds the copies not on the board.
+    Only unfinished games are kept; winner and plies are indexed by the
+    original game number.
+    """
+
+    def __init__(self, count, seed=None):
+        """Creates count games in the initial position."""
+        self.masks = np.zeros((6, count), dtype=np.int32)
+        self.turn = np.zeros(count, dtype=bool)
+        self.ids = np.arange(count)
+        self.winner = np.full(count, EMPTY, dtype=np.int8)
+        self.plies = np.zeros(count, dtype=np.int32)
+        self.ply = 0
+        self.rng = np.random.default_rng(seed)
+
+    def keys(self):
+        """Returns the engine keys of the unfinished games."""
+        keys = self.turn.astype(np.int64)
+        for index, mask in enumerate(self.masks):
+            keys |= mask.astype(np.int64) << (1 + 9 * index)
+        return keys
+
+    def options(self):
+        """
+        Returns, per size, the cells a piece of that size may land on, its
+        number of legal moves, whether one is in hand and the mover's top
+        pieces of that size.
+        """
+        masks, turn = self.masks, self.turn
+        large = masks[2] | masks[5]
+        medium = large | masks[1] | masks[4]
+        free = (~(medium | masks[0] | masks[3]) & engine.FULL, ~medium & engine.FULL,
+                ~large & engine.FULL)
+        counts, in_hands, tops = [], [], []
+        for size in engine.SIZES:
+            own = np.where(turn, masks[3 + size], masks[size])
+            in_hand = (POPCOUNT[own] < engine.COPIES).astype(np.int32)
+            # A piece is on top where a larger size may still land.
+            top = own & free[size + 1] if size < engine.LARGE else own
+            in_hands.append(in_hand)
+            tops.append(top)
+            counts.append((POPCOUNT[top] + in_hand) * POPCOUNT[free[size]])
+        return free, counts, in_hands, tops
+
+    def sample(self):
+        """Returns a uniformly random legal (src, dst, size) per game, src 9 for reserve."""
+        free, counts, in_hands, tops = self.options()
+        # A player always has a move, so the total is never zero.
+        pick = (self.rng.random(len(self.turn)) * (counts[0] + counts[1] + counts[2]))
+        pick = pick.astype(np.int32)
+        bounds = counts[0], counts[0] + counts[1]
+        medium, large = (pick >= bounds[0]) & (pick < bounds[1]), pick >= bounds[1]
+        pick -= np.where(large, bounds[1], np.where(medium, bounds[0], 0))
+        land, in_hand, top = (np.where(large, values[2], np.where(medium, values[1], values[0]))
+                              for values in (free, in_hands, tops))
+        source, dst = np.divmod(pick, POPCOUNT[land])
+        src = np.where(source < in_hand, engine.RESERVE,
+                       NTH_CELL[top, np.maximum(source - in_hand, 0)])
+        return src, NTH_CELL[land, dst], medium + 2 * large.astype(np.int32)
+
+    def play(self, src, dst, size):
+        """Moves one piece per game, without settling the winner or passing the turn."""
+        # dst is empty for the moved size and differs from src, so one xor moves the piece.
+        bits = 1 << dst | np.where(src != engine.RESERVE, 1 << np.minimum(src, 8), 0)
+        for index in engine.SIZES:
+            moved = np.where(size == index, bits, 0)
+            self.masks[index] ^= np.where(self.turn, 0, moved)
+            self.masks[3 + index] ^= np.where(self.turn, moved, 0)
+
+    def lines(self):
+        """Returns (blue, pink) arrays telling who shows a full line."""
+        masks = self.masks
+        large = masks[2] | masks[5]
+        medium = masks[1] | masks[4]
+        return tuple(HAS_LINE[masks[base + 2] | masks[base + 1] & ~large
+                              | masks[base] & ~large & ~medium] for base in (0, 3))
+
+    def step(self):
+        """Plays one random legal move in every unfinished game; returns how many."""
+        count = len(self.turn)
+        if not count:
+            return 0
+        self.ply += 1
+        turn = self.turn
+        self.play(*self.sample())
+        blue, pink = self.lines()
+        # Nobody had a line before the move, so an opponent line was exposed by the lift
+        # and wins even if the mover completed a line too.
+        exposed = np.where(turn, blue, pink)
+        done = exposed | np.where(turn, pink, blue)
+        self.turn = ~turn
+        if done.any():
+            finished = self.ids[done]
+            self.winner[finished] = np.where(exposed, ~turn, turn)[done]
+            self.plies[finished] = self.ply
+            alive = ~done
+            self.masks, self.turn = self.masks[:, alive], self.turn[alive]
+            self.ids = self.ids[alive]
+        return count
+
+    def run(self, max_plies=200):
+        """Plays until every game ends or reaches max_plies; unfinished games are draws."""
+        for _ in range(max_plies):
+            if not self.step():
+                break
+        self.plies[self.ids] = self.ply
+        return self.winner
+
+
+def simulate(count, max_plies=200, seed=None):
+    """Plays count random games and returns the winner of each (EMPTY for draws)."""
+    return Batch(count, seed).run(max_plies)
+
+
+def main():
+    """Prints the outcome shares and speed of a batch of random games."""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    start = time.perf_counter()
+    results = simulate(count)
+    elapsed = time.perf_counter() - start
+    print(f"blue {np.mean(results == engine.BLUE):.3f}  pink {np.mean(results == engine.PINK):.3f}"
+          f"  draw {np.mean(results == EMPTY):.3f}  {count / elapsed:.0f} games/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+Benchmark suite for the rules, search and rendering.
+
+Every scenario builds its workload once and returns a function that runs
+it and returns the number of operations done. The best of several runs
+is reported in operations per second as JSON, so results from different
+commits can be stored and compared; --compare exits with status 1 if a
+scenario got slower than the baseline by more than the tolerance.
+Rendering scenarios use the SDL dummy video driver, so no display is
+needed.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+import engine
+from ai import AlphaBetaPlayer
+
+SCENARIOS = {}
+_GUI = {}
+
+
+def scenario(func):
+    """Registers a benchmark scenario under its function name."""
+    SCENARIOS[func.__name__] = func
+    return func
+
+
+def sample_positions(count, seed=0):
+    """Returns unfinished positions reached by random play."""
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        pos = engine.Position()
+        for _ in range(rng.randrange(12)):
+            move = rng.choice(pos.legal_moves())
+            pos.apply(move)
+            if pos.winner is not None:
+                pos.undo(move)
+                break
+        positions.append(pos)
+    return positions
+
+
+def gui(headless=False):
+    """Returns a shared GobbletGame, drawing offscreen or on the dummy video driver."""
+    if headless not in _GUI:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+        # Imported here so the rules scenarios run without pygame installed.
+        from gobbletfinal import GobbletGame  # pylint: disable=import-outside-toplevel
+        game = GobbletGame(headless=headless)
+        for move in ((engine.RESERVE, 4, engine.LARGE), (engine.RESERVE, 0, engine.MEDIUM),
+                     (engine.RESERVE, 8, engine.SMALL)):
+            game.apply_move(move)
+        _GUI[headless] = game
+    return _GUI[headless]
+
+
+@scenario
+def check_board_win():
+    """Win detection on the GUI over sample positions."""
+    game = gui()
+    saved = game.position
+    positions = sample_positions(1000)
+
+    def run():
+        for pos in positions:
+            game.position = pos
+            game.check_board_win()
+        game.position = saved
+        return len(positions)
+    return run
+
+
+@scenario
+def get_grid_cell():
+    """Mapping window pixels to cells and their stacks."""
+    game = gui()
+    rng = random.Random(0)
+    points = [(rng.randrange(game.window_width), rng.randrange(game.window_height))
+              for _ in range(10000)]
+
+    def run():
+        for x, y in points:
+            game.get_grid_cell(x, y)
+        return len(points)
+    return run
+
+
+@scenario
+def move_generation():
+    """Legal move generation on sample positions."""
+    positions = sample_positions(1000)
+
+    def run():
+        for pos in positions:
+            pos.legal_moves()
+        return len(positions)
+    return run
+
+
+@scenario
+def make_unmake():
+    """Applying and taking back every legal move of sample positions."""
+    pairs = [(pos, move) for pos in sample_positions(200) for move in pos.legal_moves()]
+
+    def run():
+        for pos, move in pairs:
+            pos.apply(move)
+            pos.undo(move)
+        return len(pairs)
+    return run
+
+
+@scenario
+def random_games():
+    """Whole games of random moves, capped at 200 plies."""
+    rng = random.Random(0)
+
+    def run():
+        for _ in range(200):
+            pos = engine.Position()
+            for _ in range(200):
+                if pos.winner is not None:
+                    break
+                pos.apply(rng.choice(pos.legal_moves()))
+        return 200
+    return run
+
+
+@scenario
+def ai_nodes():
+    """Alpha-beta nodes searched from the initial position in 200 ms."""
+    def run():
+        player = AlphaBetaPlayer(200)
+        player.choose(engine.Position())
+        return player.nodes
+    return run
+
+
+@scenario
+def frame_render():
+    """Full redraws of the board on the dummy video driver."""
+    game = gui()
+
+    def run():
+        for _ in range(100):
+            game.renderer.invalidate()
+            game.renderer.render()
+        return 100
+    return run
+
+
+@scenario
+def headless_frames():
+    """Frames of random games drawn offscreen and read back as raw RGB."""
+    game = gui(headless=True)
+    rng = random.Random(0)
+
+    def run():
+        for _ in range(100):
+            if game.game_over:
+                game.reset_game()
+            game.apply_move(rng.choice(game.position.legal_moves()))
+            game.renderer.frame_rgb()
+        return 100
+    return run
+
+
+FIRST_FRAME = "from gobbletfinal import GobbletGame; GobbletGame().renderer.render()"
+FIRST_MOVE = """
+import sys
+import engine
+from ai import AlphaBetaPlayer
+AlphaBetaPlayer(max_depth=2).choose(engine.Position())
+assert "pygame" not in sys.modules
+"""
+
+
+def startup(code):
+    """Runs code in a fresh interpreter, so the time includes every import; returns 1."""
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", PYGAME_HIDE_SUPPORT_PROMPT="1")
+    subprocess.run([sys.executable, "-c", code], check=True, env=env,
+                   cwd=os.path.dirname(os.path.abspath(__file__)))
+    return 1
+
+
+@scenario
+def first_frame():
+    """Launches per second, from starting Python to the first frame drawn."""
+    return lambda: startup(FIRST_FRAME)
+
+
+@scenario
+def first_move():
+    """Launches per second, from starting Python to the first computer move, without pygame."""
+    return lambda: startup(FIRST_MOVE)
+
+
+def measure(name, repeat):
+    """Returns the best operations per second over repeat runs of a scenario."""
+    run = SCENARIOS[name]()
+    best = 0.0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ops = run()
+        best = max(best, ops / (time.perf_counter() - start))
+    return best
+
+
+def commit():
+    """Returns the current git commit, or None outside a checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """Returns a message for every scenario slower than the baseline by over tolerance."""
+    slower = []
+    for name, entry in results.items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before and entry["ops_per_second"] < before["ops_per_second"] * (1 - tolerance):
+            slower.append(f"{name}: {before['ops_per_second']:.0f} -> "
+                          f"{entry['ops_per_second']:.0f} ops/s")
+    return slower
+
+
+def main():
+    """Runs the selected scenarios and prints or saves the JSON report."""
+    parser = argparse.ArgumentParser(description="Benchmark Gobblet Jr.")
+    parser.add_argument("scenarios", nargs="*",
+                        help=f"scenarios to run, all by default: {', '.join(SCENARIOS)}")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per scenario")
+    parser.add_argument("--output", "-o", help="write the JSON report to a file")
+    parser.add_argument("--compare", help="baseline JSON report to check against")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="allowed slowdown against the baseline")
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    results = {}
+    for name in args.scenarios or SCENARIOS:
+        speed = measure(name, args.repeat)
+        results[name] = {"ops_per_second": speed, "seconds_per_op": 1 / speed,
+                         "description": SCENARIOS[name].__doc__}
+        print(f"{name:>16}: {results[name]['ops_per_second']:12.0f} ops/s", file=sys.stderr)
+    report = {"commit": commit(), "python": platform.python_version(),
+              "machine": platform.machine(), "scenarios": results}
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as out:
+            out.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as src:
+            slower = compare(results, json.load(src), args.tolerance)
+        for line in slower:
+            print(f"slower: {line}", file=sys.stderr)
+        if slower:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Opening book keyed by canonical position.
+
+For every canonical opening position the book stores each move tried
+there with the number of games and the points scored by the mover (two
+for a win, one for a draw), so best moves and win rates are read off
+directly. Best moves are ranked by the lower bound of the Wilson score
+interval on their win rate, so a move that won its only game does not
+beat one that scored well over thousands. Books are built offline from
+the first plies of game records or self-play datasets, and books from
+separate runs are merged by adding their counts. On disk a book is a
+16-byte header followed by sorted fixed-size entries; a Book only reads
+the file on its first lookup and then answers from a dictionary.
+"""
+import math
+import struct
+import sys
+
+import engine
+import record
+import selfplay
+from solver import DRAW, WIN
+from symmetry import INVERSE, canonical, transform_move
+
+MAGIC = b"GJOB"
+HEADER = struct.Struct("<4sIQ")
+ENTRY = struct.Struct("<QBII")
+POINTS = {WIN: 2, DRAW: 1}
+MIN_GAMES = 10
+START = engine.Position().key()
+# Normal quantile of the 95% interval used to rank moves.
+Z = 1.96
+
+
+def add(stats, key, move, points):
+    """Counts one game in which the side to move at key played move."""
+    canonical_key, index = canonical(key)
+    entry = (canonical_key, record.encode_move(transform_move(move, index)))
+    games, total = stats.get(entry, (0, 0))
+    stats[entry] = (games + 1, total + points)
+
+
+def add_records(stats, path, plies):
+    """Adds the first plies moves of every finished game in a record log."""
+    with open(path, "rb") as src:
+        for _, result, codes in record.iter_records(src):
+            if result == record.UNFINISHED:
+                continue
+            pos = engine.Position()
+            for move in record.replay(codes[:plies], pos.copy()):
+                if result == record.DRAW:
+                    points = 1
+                else:
+                    points = 2 if result == pos.turn else 0
+                add(stats, pos.key(), move, points)
+                pos.apply(move)
+
+
+def add_dataset(stats, path, plies):
+    """Adds the self-play samples of the first plies moves of every game in a dataset."""
+    ply = 0
+    for key, code, outcome in selfplay.iter_samples(path):
+        # A game's samples are stored in order, and only its first one is the empty board.
+        ply = 0 if key == START else ply + 1
+        if ply < plies:
+            pos = engine.Position.from_key(key)
+            add(stats, key, record.decode_move(code, pos), POINTS.get(outcome, 0))
+
+
+def lower_bound(rate, games):
+    """Returns the lower end of the Wilson score interval for a win rate over games."""
+    spread = Z * math.sqrt(rate * (1 - rate) / games + Z * Z / (4 * games * games))
+    return (rate + Z * Z / (2 * games) - spread) / (1 + Z * Z / games)
+
+
+def save(stats, path):
+    """Writes book statistics to a file, sorted by position."""
+    with open(path, "wb") as out:
+        out.write(HEADER.pack(MAGIC, engine.COPIES, len(stats)))
+        for (key, code), (games, points) in sorted(stats.items()):
+            out.write(ENTRY.pack(key, code, games, points))
+
+
+def load(path, stats=None):
+    """Reads book statistics, adding them to stats if given."""
+    stats = {} if stats is None else stats
+    with open(path, "rb") as src:
+        magic, copies, count = HEADER.unpack(src.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an opening book")
+        if copies != engine.COPIES:
+            raise ValueError(f"{path} was built for a different piece set")
+        for key, code, games, points in ENTRY.iter_unpack(src.read(count * ENTRY.size)):
+            old_games, old_points = stats.get((key, code), (0, 0))
+            stats[key, code] = (old_games + games, old_points + points)
+    return stats
+
+
+class Book:
+    """Read-only opening book, loaded from disk on its first lookup."""
+
+    def __init__(self, path, min_games=MIN_GAMES):
+        """Remembers the file; moves tried in fewer than min_games games are ignored."""
+        self.path = path
+        self.min_games = min_games
+        self.positions = None
+
+    def _load(self):
+        """Groups the file's entries by canonical position."""
+        self.positions = {}
+        for (key, code), counts in load(self.path).items():
+            if counts[0] >= self.min_games:
+                self.positions.setdefault(key, []).append((code, *counts))
+
+    def moves(self, pos):
+        """Returns (move, games, win rate) for every book move of a position."""
+        if self.positions is None:
+            self._load()
+        canonical_key, index = canonical(pos.key())
+        entries = self.positions.get(canonical_key, ())
+        if not entries:
+            return []
+        image = engine.Position.from_key(canonical_key)
+        return [(transform_move(record.decode_move(code, image), INVERSE[index]),
+                 games, points / (2 * games))
+                for code, games, points in entries]
+
+    def best_move(self, pos):
+        """
+        Returns the book move with the best lower bound on its win rate, or
+        None if out of book.
+        """
+        moves = self.moves(pos)
+        if not moves:
+            return None
+        return max(moves, key=lambda entry: lower_bound(entry[2], entry[1]))[0]
+
+
+class BookPlayer:
+    """Plays from an opening book and hands over to another player after it."""
+
+    def __init__(self, book, player):
+        """Wraps a player with a Book."""
+        self.book = book
+        self.player = player
+
+    def choose(self, pos):
+        """Returns the book move, or the wrapped player's move out of book."""
+        if pos.is_terminal():
+            return None
+        return self.book.best_move(pos) or self.player.choose(pos)
+
+    def close(self):
+        """Closes the wrapped player."""
+        self.player.close()
+
+
+def main():
+    """Builds or merges books from the command line."""
+    usage = ("usage: python3 book.py build OUTPUT PLIES SOURCE...\n"
+             "       python3 book.py merge OUTPUT BOOK...")
+    if len(sys.argv) < 4 or sys.argv[1] not in ("build", "merge"):
+        sys.exit(usage)
+    stats = {}
+    if sys.argv[1] == "merge":
+        for path in sys.argv[3:]:
+            load(path, stats)
+    else:
+        plies = int(sys.argv[3])
+        for path in sys.argv[4:]:
+            with open(path, "rb") as src:
+                is_dataset = src.read(len(selfplay.MAGIC)) == selfplay.MAGIC
+            (add_dataset if is_dataset else add_records)(stats, path, plies)
+    save(stats, sys.argv[2])
+    print(f"{len(stats)} book entries written to {sys.argv[2]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+"""
+Headless Gobblet Jr. rules engine.
+
+Holds the board, reserves and side to move without touching pygame, so
+positions can be generated, played and undone at full Python speed.
+"""
+import os
+import sys
+import time
+from enum import IntEnum
+from typing import NamedTuple
+
+
+class Colour(IntEnum):
+    """Player colours; the values index per-colour tables."""
+    BLUE = 0
+    PINK = 1
+
+
+BLUE, PINK = Colour.BLUE, Colour.PINK
+COLOURS = (BLUE, PINK)
+SMALL, MEDIUM, LARGE = 0, 1, 2
+SIZES = (SMALL, MEDIUM, LARGE)
+# Copies of each size per player; GOBBLET_COPIES=1 selects the small variant the solver handles.
+COPIES = int(os.environ.get("GOBBLET_COPIES", "2"))
+RESERVE = 9
+CELLS = range(9)
+FULL = 0x1FF
+LINES = (
+    (0, 1, 2), (3, 4, 5), (6, 7, 8),
+    (0, 3, 6), (1, 4, 7), (2, 5, 8),
+    (0, 4, 8), (2, 4, 6),
+)
+LINE_MASKS = tuple(sum(1 << cell for cell in line) for line in LINES)
+CELL_LINES = tuple(tuple(index for index, line in enumerate(LINES) if cell in line)
+                   for cell in CELLS)
+# Cell indices set in each 9-bit mask, so loops never test bits one by one.
+CELLS_OF = tuple(tuple(cell for cell in CELLS if mask >> cell & 1)
+                 for mask in range(FULL + 1))
+# One shared tuple per (src, dst, size) move, so generating moves never allocates them.
+MOVE = tuple(tuple(tuple((src, dst, size) for size in SIZES) for dst in CELLS)
+             for src in range(RESERVE + 1))
+
+
+def _by_mask(moves):
+    """Returns, for every cell mask, the moves of a per-cell list on those cells."""
+    return tuple(tuple(map(moves.__getitem__, cells)) for cells in CELLS_OF)
+
+
+# MOVES_TO[src][size][free]: every move of a size from src onto a cell in free.
+MOVES_TO = tuple(tuple(_by_mask([MOVE[src][dst][size] for dst in CELLS]) for size in SIZES)
+                 for src in range(RESERVE + 1))
+# MOVES_FROM[dst][size][free]: every board move of a size onto dst from a cell in free.
+MOVES_FROM = tuple(tuple(_by_mask([MOVE[src][dst][size] for src in CELLS]) for size in SIZES)
+                   for dst in CELLS)
+
+
+OPPONENTS = (PINK, BLUE)
+
+
+def other(colour):
+    """Returns the opponent of the given colour."""
+    return OPPONENTS[colour]
+
+
+class Piece(NamedTuple):
+    """A piece as seen on the board: its colour and size (SMALL to LARGE)."""
+    colour: Colour
+    size: int
+
+
+# One shared instance per piece kind, so lookups never allocate.
+PIECES = tuple(tuple(Piece(colour, size) for size in SIZES) for colour in COLOURS)
+
+
+class Position:
+    """
+    A Gobblet Jr. position stored as bitboards.
+
+    masks[colour * 3 + size] is the 9-bit set of cells holding a piece of
+    that colour and size. A stack never holds two pieces of one size, so
+    these six masks describe the board completely and the top of a stack
+    is simply its largest piece. Moves are (src, dst, size) tuples where
+    src is a cell index or RESERVE.
+
+    lines[colour][line] counts the visible pieces each colour has on each
+    win line. Moves only update the lines through the cells they touch.
+    """
+    __slots__ = ("masks", "reserves", "turn", "winner", "lines")
+
+    def __init__(self):
+        """Creates the initial position with every piece in reserve."""
+        self.masks = [0] * 6
+        self.reserves = [[COPIES] * len(SIZES) for _ in COLOURS]
+        self.turn = BLUE
+        self.winner = None
+        self.lines = [[0] * len(LINES) for _ in COLOURS]
+
+    def copy(self):
+        """Returns an independent copy of the position."""
+        pos = Position.__new__(Position)
+        pos.masks = self.masks[:]
+        pos.reserves = [counts[:] for counts in self.reserves]
+        pos.turn = self.turn
+        pos.winner = self.winner
+        pos.lines = [counts[:] for counts in self.lines]
+        return pos
+
+    def key(self):
+        """Packs the position into a single int usable as a dict key."""
+        key = self.turn
+        for index, mask in enumerate(self.masks):
+            key |= mask << (1 + 9 * index)
+        return key
+
+    @classmethod
+    def from_key(cls, key):
+        """Rebuilds a position from the int returned by key."""
+        pos = cls()
+        pos.turn = COLOURS[key & 1]
+        for index in range(6):
+            mask = key >> (1 + 9 * index) & FULL
+            pos.masks[index] = mask
+            pos.reserves[index // 3][index % 3] = COPIES - len(CELLS_OF[mask])
+        for colour in COLOURS:
+            visible = pos.visible(colour)
+            pos.lines[colour] = [len(CELLS_OF[visible & line]) for line in LINE_MASKS]
+        winning = pos.winners()
+        if winning:
+            # The side to move is the opponent of whoever made the last move.
+            pos.winner = winning.pop() if len(winning) == 1 else pos.turn
+        return pos
+
+    def covering(self, size):
+        """Returns the mask of cells already holding a piece of size or larger."""
+        masks = self.masks
+        covered = 0
+        for big in range(size, len(SIZES)):
+            covered |= masks[big] | masks[3 + big]
+        return covered
+
+    def top(self, cell):
+        """Returns the visible (colour, size) piece at a cell, or None."""
+        bit = 1 << cell
+        for size in (LARGE, MEDIUM, SMALL):
+            if self.masks[size] & bit:
+                return PIECES[BLUE][size]
+            if self.masks[3 + size] & bit:
+                return PIECES[PINK][size]
+        return None
+
+    def stack(self, cell):
+        """Returns the pieces at a cell from bottom to top."""
+        return [PIECES[colour][size] for size in SIZES for colour in COLOURS
+                if self.masks[colour * 3 + size] >> cell & 1]
+
+    def can_land(self, cell, size):
+        """Returns True if a piece of the given size may be put on the cell."""
+        return not self.covering(size) >> cell & 1
+
+    def visible(self, colour):
+        """Returns the mask of cells whose top piece has the given colour."""
+        masks = self.masks
+        large = masks[LARGE] | masks[3 + LARGE]
+        medium = masks[MEDIUM] | masks[3 + MEDIUM]
+        base = colour * 3
+        return (masks[base + LARGE] | masks[base + MEDIUM] & ~large
+                | masks[base + SMALL] & ~large & ~medium)
+
+    def free_masks(self):
+        """Returns, per size, the mask of cells a piece of that size may land on."""
+        masks = self.masks
+        large = masks[LARGE] | masks[3 + LARGE]
+        medium = large | masks[MEDIUM] | masks[3 + MEDIUM]
+        small = medium | masks[SMALL] | masks[3 + SMALL]
+        return (~small & FULL, ~medium & FULL, ~large & FULL)
+
+    def legal_moves(self, out=None):
+        """
+        Returns every legal move for the side to move.
+
+        Pass a list as out to have it cleared and refilled instead of
+        allocating a new one.
+        """
+        moves = [] if out is None else out
+        moves.clear()
+        if self.winner is not None:
+            return moves
+        base = self.turn * 3
+        masks = self.masks
+        reserves = self.reserves[self.turn]
+        free = self.free_masks()
+        for size in SIZES:
+            land = free[size]
+            if reserves[size]:
+                moves.extend(MOVES_TO[RESERVE][size][land])
+            # A piece is on top where no larger piece sits, i.e. where a larger size may land.
+            tops = masks[base + size] & (free[size + 1] if size < LARGE else FULL)
+            for src in CELLS_OF[tops]:
+                moves.extend(MOVES_TO[src][size][land])
+        return moves
+
+    def unmoves(self):
+        """Returns every move the previous player could have just played."""
+        base = other(self.turn) * 3
+        masks = self.masks
+        free = self.free_masks()
+        moves = []
+        for size in SIZES:
+            tops = masks[base + size] & (free[size + 1] if size < LARGE else FULL)
+            for dst in CELLS_OF[tops]:
+                moves.append(MOVE[RESERVE][dst][size])
+                moves.extend(MOVES_FROM[dst][size][free[size]])
+        return moves
+
+    def is_legal(self, move):
+        """Returns True if the move can be played in this position."""
+        src, dst, size = move
+        if self.winner is not None or src == dst or not self.can_land(dst, size):
+            return False
+        if src == RESERVE:
+            return self.reserves[self.turn][size] > 0
+        return self.top(src) == (self.turn, size)
+
+    def winners(self):
+        """Returns the set of colours owning a full line of visible pieces."""
+        winning = set()
+        for colour in COLOURS:
+            visible = self.visible(colour)
+            for line in LINE_MASKS:
+                if visible & line == line:
+                    winning.add(colour)
+                    break
+        return winning
+
+    def apply(self, move):
+        """
+        Plays a legal move and settles the winner, if any.
+
+        Lifting a piece can expose an opponent line. The opponent then wins
+        unless the piece lands on that line, even if the mover completes a
+        line of their own.
+        """
+        src, dst, size = move
+        turn = self.turn
+        opponent = other(turn)
+        lines = self.lines
+        index = turn * 3 + size
+        exposed = ()
+        if src == RESERVE:
+            self.reserves[turn][size] -= 1
+        else:
+            self.masks[index] ^= 1 << src
+            for line in CELL_LINES[src]:
+                lines[turn][line] -= 1
+            below = self.top(src)
+            if below is not None:
+                counts = lines[below[0]]
+                for line in CELL_LINES[src]:
+                    counts[line] += 1
+                if below[0] == opponent:
+                    exposed = [line for line in CELL_LINES[src] if counts[line] == 3]
+        covered = self.top(dst)
+        if covered is not None:
+            counts = lines[covered[0]]
+            for line in CELL_LINES[dst]:
+                counts[line] -= 1
+        counts = lines[turn]
+        for line in CELL_LINES[dst]:
+            counts[line] += 1
+        self.masks[index] |= 1 << dst
+        if any(lines[opponent][line] == 3 for line in exposed):
+            self.winner = opponent
+        elif (any(counts[line] == 3 for line in CELL_LINES[dst])
+              or src != RESERVE and any(counts[line] == 3 for line in CELL_LINES[src])):
+            self.winner = turn
+        self.turn = opponent
+
+    def undo(self, move):
+        """Takes back a move previously played with apply."""
+        src, dst, size = move
+        self.turn = turn = other(self.turn)
+        self.winner = None
+        lines = self.lines
+        index = turn * 3 + size
+        self.masks[index] ^= 1 << dst
+        for line in CELL_LINES[dst]:
+            lines[turn][line] -= 1
+        covered = self.top(dst)
+        if covered is not None:
+            counts = lines[covered[0]]
+            for line in CELL_LINES[dst]:
+                counts[line] += 1
+        if src == RESERVE:
+            self.reserves[turn][size] += 1
+        else:
+            below = self.top(src)
+            if below is not None:
+                counts = lines[below[0]]
+                for line in CELL_LINES[src]:
+                    counts[line] -= 1
+            for line in CELL_LINES[src]:
+                lines[turn][line] += 1
+            self.masks[index] |= 1 << src
+
+    def is_terminal(self):
+        """Returns True once a player has won."""
+        return self.winner is not None
+
+
+class Game:
+    """
+    A position together with the moves that led to it.
+
+    make_move and unmake_move are O(1): Position.undo restores any piece
+    the move had uncovered, so no position is ever copied. Undone moves
+    are kept for redo until a different move is made.
+    """
+    __slots__ = ("position", "history", "future")
+
+    def __init__(self, position=None):
+        """Starts a game from a position, by default the initial one."""
+        self.position = position or Position()
+        self.history = []
+        self.future = []
+
+    def make_move(self, move):
+        """Plays a legal move and forgets any undone moves."""
+        self.position.apply(move)
+        self.history.append(move)
+        self.future.clear()
+
+    def unmake_move(self):
+        """Takes back the last move and returns it, or None at the start."""
+        if not self.history:
+            return None
+        move = self.history.pop()
+        self.position.undo(move)
+        self.future.append(move)
+        return move
+
+    def redo(self):
+        """Replays the last undone move and returns it, or None."""
+        if not self.future:
+            return None
+        move = self.future.pop()
+        self.position.apply(move)
+        self.history.append(move)
+        return move
+
+
+def perft(pos, depth, buffers=None):
+    """Counts the move sequences of exactly depth plies from a position."""
+    if buffers is None:
+        buffers = [[] for _ in range(depth + 1)]
+    moves = pos.legal_moves(buffers[depth])
+    if depth <= 1:
+        return len(moves) if depth else 1
+    total = 0
+    for move in moves:
+        pos.apply(move)
+        total += perft(pos, depth - 1, buffers)
+        pos.undo(move)
+    return total
+
+
+if __name__ == "__main__":
+    for plies in range(1, int(sys.argv[1]) + 1 if len(sys.argv) > 1 else 5):
+        start = time.perf_counter()
+        count = perft(Position(), plies)
+        elapsed = time.perf_counter() - start
+        print(f"perft({plies}) = {count}  {count / elapsed:.0f} leaves/s")
@@ -0,0 +1,64 @@
+"""
+Offscreen frame export for recorded games.
+
+Replays the games of a record log on a headless GobbletGame and writes
+either one PNG per ply, or only the final position for thumbnails, or
+one raw RGB file per game holding every frame back to back, which video
+encoders read directly (ffmpeg -f rawvideo -pixel_format rgb24).
+"""
+import argparse
+import os
+import time
+
+from gobbletfinal import GobbletGame
+from replay import GameLog
+
+
+def export_game(view, directory, fmt="png", scale=1.0, last_only=False):
+    """Writes the frames of the game open in a ReplayView of a headless game; returns the count."""
+    game = view.game
+    plies = range(len(view.replay) if last_only else 0, len(view.replay) + 1)
+    name = os.path.join(directory, f"game{view.index + 1:06d}")
+    if fmt == "png":
+        for ply in plies:
+            view.seek(ply)
+            game.renderer.save_frame(f"{name}.png" if last_only else f"{name}_{ply:03d}.png", scale)
+        return len(plies)
+    with open(f"{name}.rgb", "wb") as out:
+        for ply in plies:
+            view.seek(ply)
+            out.write(game.renderer.frame_rgb(scale))
+    return len(plies)
+
+
+def main():
+    """Exports frames for the games of a log from the command line."""
+    parser = argparse.ArgumentParser(description="Render recorded games without a display.")
+    parser.add_argument("log", help="game record log")
+    parser.add_argument("directory", help="output directory")
+    parser.add_argument("--format", choices=["png", "rgb"], default="png")
+    parser.add_argument("--scale", type=float, default=1.0, help="frame size factor")
+    parser.add_argument("--last-only", action="store_true",
+                        help="only the final position of each game, for thumbnails")
+    parser.add_argument("--games", type=int, help="export at most this many games")
+    args = parser.parse_args()
+    os.makedirs(args.directory, exist_ok=True)
+    game = GobbletGame(headless=True)
+    frames = 0
+    start = time.perf_counter()
+    try:
+        log = GameLog(args.log)
+        view = game.open_log(log)
+    except ValueError as error:
+        parser.error(f"{args.log}: {error}")
+    for index in range(min(len(log), args.games or len(log))):
+        view.open(index)
+        frames += export_game(view, args.directory, args.format, args.scale, args.last_only)
+    elapsed = time.perf_counter() - start
+    width, height = game.renderer.frame(args.scale).get_size()
+    print(f"{frames} {width}x{height} frames in {elapsed:.2f} s, {frames / elapsed:.0f} frames/s")
+    log.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Command-line entry point for the headless tools.
+
+    python3 gobblet.py tournament random greedy alphabeta:100 mcts:500 --games 1000
+
+Subcommands never import pygame.
+"""
+import argparse
+
+import tournament
+
+
+def run_tournament(args):
+    """Plays or resumes a round robin and prints the standings."""
+    config = {"players": args.players, "games": args.games, "batch": args.batch,
+              "random_plies": args.random_plies, "seed": args.seed}
+    results = tournament.run(config, args.output, args.workers)
+    tournament.print_standings(tournament.standings(args.players, results, args.seed))
+
+
+def main():
+    """Parses the subcommand and runs it."""
+    parser = argparse.ArgumentParser(prog="gobblet", description="Gobblet Jr. tools.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    play = commands.add_parser("tournament", help="round robin with Elo ratings")
+    play.add_argument("players", nargs="+",
+                      help="player specs: random, greedy, alphabeta:MS, mcts:ITERATIONS, "
+                           "tablebase:FILE")
+    play.add_argument("--games", type=int, default=100, help="games per pair of players")
+    play.add_argument("--output", default="tournament.jsonl",
+                      help="results file, resumed if it exists")
+    play.add_argument("--workers", type=int, default=None, help="worker processes")
+    play.add_argument("--batch", type=int, default=10, help="games per batch")
+    play.add_argument("--random-plies", type=int, default=2,
+                      help="random opening plies, so deterministic players vary")
+    play.add_argument("--seed", type=int, default=0)
+    play.set_defaults(func=run_tournament)
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
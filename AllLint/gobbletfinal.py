@@ -1,132 +1,167 @@
 """
 Gobblet Jr. game implementation using pygame.
 """
-# pylint: disable=no-member
+# pylint: disable=no-member,import-outside-toplevel
+import argparse
+import functools
 import pygame
+import engine
+from ai import AlphaBetaPlayer
+from replay import KEYFRAME_EVERY, GameLog
+
+
+class PieceSprite:
+    """An engine piece plus where it is drawn and which cell holds it."""
+    __slots__ = ("piece", "pos", "cell", "orig_pos", "home")
+
+    def __init__(self, piece, pos):
+        """Places a piece in its reserve slot."""
+        self.piece = piece
+        self.pos = list(pos)
+        self.cell = None
+        self.orig_pos = self.pos[:]
+        self.home = self.pos[:]
+
+    def lift(self):
+        """Remembers the current position so the move can be reverted."""
+        self.orig_pos = self.pos[:]
+
+    def revert(self):
+        """Puts the piece back where it was lifted from."""
+        self.pos = self.orig_pos
+
+
+@functools.lru_cache(maxsize=None)
+def get_font(size):
+    """Returns the default font at a size, loading it only once."""
+    return pygame.font.Font(None, size)
+
 
 class GobbletGame:
     """Gobblet Jr. game implementation"""
-    WHITE = (255, 255, 255)
-    BLACK = (0, 0, 0)
-    BLUE = (0, 190, 255)
-    PINK = (255, 105, 180)
-    LIME = (50, 205, 50)
-    PURPLE = (128, 0, 128)
     SMALL_RADIUS = 10
     MEDIUM_RADIUS = 20
     LARGE_RADIUS = 30
-    def __init__(self):
-        """Initialize the game"""
-        pygame.init()
-        self.window_width, self.window_height = 615, 700
-        self.screen = pygame.display.set_mode((self.window_width, self.window_height))
-        pygame.display.set_caption("Gobblet Jr.")
-        self.grid_size = 300
-        self.grid_x = (self.window_width - self.grid_size) // 2
-        self.grid_y = (self.window_height - self.grid_size) // 2
-        self.cell_size = self.grid_size // 3
+    FPS = 60
+    RADII = (SMALL_RADIUS, MEDIUM_RADIUS, LARGE_RADIUS)
+    # The window layout never changes, so every game shares it.
+    window_width, window_height = 615, 700
+    grid_size = 300
+    grid_x = (window_width - grid_size) // 2
+    grid_y = (window_height - grid_size) // 2
+    cell_size = grid_size // 3
+    # The engine settles the winner inside apply_move; sync_state copies it to the screen state.
+    PROFILED = ("handle_event", "apply_move", "sync_state", "play_ai_move")
+    def __init__(self, tablebase=None, ai_colour=None, ai_player=None, headless=False):
+        """Initialize the game; a headless game draws to an offscreen surface."""
+        # Only the modules in use are started; pygame.init() would also open audio and joysticks.
         pygame.font.init()
-        self.font = pygame.font.Font(None, 36)
-        self.spacing_x = self.LARGE_RADIUS * 2
-        self.spacing_y = self.LARGE_RADIUS * 1.5
-        self.left_x = self.grid_x - self.spacing_x * 2
-        self.right_x = self.grid_x + self.grid_size + self.spacing_x * 2
-        self.row2_y = self.window_height - self.LARGE_RADIUS - 20
-        self.row1_y = self.row2_y - self.spacing_y * 1.5
-        self.pieces = self.init_pieces()
+        self.renderer = Renderer(self, headless)
+        self.game = engine.Game()
+        self.position = self.game.position
+        self.pieces = self._init_pieces()
+        self.cells, self.reserves = self._index_pieces()
         self.selected_piece = None
         self.turn = "BLUE"
         self.game_over = False
         self.winner = None
+        self.tablebase = tablebase
+        self.hint = None
+        self.ai_colour = ai_colour
+        self.ai_player = ai_player or AlphaBetaPlayer()
+        self.replay = None
+        self.profiling = None
+        self.clock = pygame.time.Clock()
 
-    def init_pieces(self):
-        """Initializes all pieces."""
-        return [
-            # Blue pieces (Left side)
-            {"color": self.BLUE, "pos": [self.left_x, self.row1_y],
-                "radius": self.SMALL_RADIUS, "stack": []},
-            {"color": self.BLUE, "pos": [self.left_x + self.spacing_x - 12, self.row1_y],
-                "radius": self.MEDIUM_RADIUS, "stack": []},
-            {"color": self.BLUE, "pos": [self.left_x + self.spacing_x * 2, self.row1_y],
-                "radius": self.LARGE_RADIUS, "stack": []},
-            {"color": self.BLUE, "pos": [self.left_x, self.row2_y],
-                "radius": self.SMALL_RADIUS, "stack": []},
-            {"color": self.BLUE, "pos": [self.left_x + self.spacing_x - 12, self.row2_y],
-                "radius": self.MEDIUM_RADIUS, "stack": []},
-            {"color": self.BLUE, "pos": [self.left_x + self.spacing_x * 2, self.row2_y],
-                "radius": self.LARGE_RADIUS, "stack": []},
-            # Pink pieces (Right side)
-            {"color": self.PINK, "pos": [self.right_x, self.row1_y],
-                "radius": self.SMALL_RADIUS, "stack": []},
-            {"color": self.PINK, "pos": [self.right_x - self.spacing_x + 12, self.row1_y],
-                "radius": self.MEDIUM_RADIUS, "stack": []},
-            {"color": self.PINK, "pos": [self.right_x - self.spacing_x * 2, self.row1_y],
-                "radius": self.LARGE_RADIUS, "stack": []},
-            {"color": self.PINK, "pos": [self.right_x, self.row2_y],
-                "radius": self.SMALL_RADIUS, "stack": []},
-            {"color": self.PINK, "pos": [self.right_x - self.spacing_x + 12, self.row2_y],
-                "radius": self.MEDIUM_RADIUS, "stack": []},
-            {"color": self.PINK, "pos": [self.right_x - self.spacing_x * 2, self.row2_y],
-                "radius": self.LARGE_RADIUS, "stack": []}
-        ]
+    def _init_pieces(self):
+        """Initializes all pieces, one reserve row per copy of each size."""
+        blue, pink = engine.PIECES
+        spacing_x, spacing_y = self.LARGE_RADIUS * 2, self.LARGE_RADIUS * 1.5
+        left_x = self.grid_x - spacing_x * 2
+        right_x = self.grid_x + self.grid_size + spacing_x * 2
+        row2_y = self.window_height - self.LARGE_RADIUS - 20
+        row1_y = row2_y - spacing_y * 1.5
+        pieces = []
+        for row_y in (row1_y, row2_y)[:engine.COPIES]:
+            pieces += [
+                # Blue pieces (Left side)
+                PieceSprite(blue[engine.SMALL], [left_x, row_y]),
+                PieceSprite(blue[engine.MEDIUM], [left_x + spacing_x - 12, row_y]),
+                PieceSprite(blue[engine.LARGE], [left_x + spacing_x * 2, row_y]),
+                # Pink pieces (Right side)
+                PieceSprite(pink[engine.SMALL], [right_x, row_y]),
+                PieceSprite(pink[engine.MEDIUM], [right_x - spacing_x + 12, row_y]),
+                PieceSprite(pink[engine.LARGE], [right_x - spacing_x * 2, row_y]),
+            ]
+        return pieces
+
+    def _index_pieces(self):
+        """
+        Builds the nine cell stacks (bottom to top) and the per-player
+        reserves that every lookup and the drawing order go through.
+        """
+        cells = [[] for _ in engine.CELLS]
+        reserves = {engine.BLUE: [], engine.PINK: []}
+        for p in self.pieces:
+            if p.cell is None:
+                reserves[p.piece.colour].append(p)
+            else:
+                cells[p.cell].append(p)
+        return cells, reserves
 
     def reset_game(self):
         """Resets the game state."""
-        self.pieces = self.init_pieces()
+        self.game = engine.Game()
+        self.position = self.game.position
+        self.pieces = self._init_pieces()
+        self.cells, self.reserves = self._index_pieces()
         self.selected_piece = None
         self.turn = "BLUE"
         self.game_over = False
         self.winner = None
+        self.hint = None
+        self.renderer.invalidate()
 
-    def draw_grid(self):
-        """Draws a 3x3 grid."""
-        for i in range(1, 3):
-            pygame.draw.line(
-                self.screen, self.BLACK,
-                (self.grid_x + i * self.cell_size, self.grid_y),
-                (self.grid_x + i * self.cell_size, self.grid_y + self.grid_size),
-                5
-            )
-            pygame.draw.line(
-                self.screen, self.BLACK,
-                (self.grid_x, self.grid_y + i * self.cell_size),
-                (self.grid_x + self.grid_size, self.grid_y + i * self.cell_size),
-                5
-            )
-        pygame.draw.rect(self.screen, self.BLACK, (self.grid_x,
-                            self.grid_y, self.grid_size, self.grid_size), 5)
+    def find_piece(self, src, size):
+        """Returns the piece of the side to move at a cell or in reserve."""
+        if src != engine.RESERVE:
+            return self.cells[src][-1] if self.cells[src] else None
+        for p in self.reserves[self.position.turn]:
+            if p.piece.size == size:
+                return p
+        return None
 
-    def write_text(self):
-        """Displays player names, turn."""
-        text1 = self.font.render("Player 1", True, self.BLUE)
-        text2 = self.font.render("Player 2", True, self.PINK)
-        turn_text = self.font.render(f"Turn: {self.turn}", True, self.BLACK)
-        self.screen.blit(text1, (20, 50))
-        self.screen.blit(text2, (self.window_width - 110, 50))
-        self.screen.blit(turn_text, (self.window_width // 2 - 50, 20))
+    def show_hint(self):
+        """Looks up the perfect move in the tablebase."""
+        if self.tablebase is not None:
+            self.hint = self.tablebase.best_move(self.position)
+            self.renderer.invalidate()
 
-    def draw_pieces(self):
-        """Draws all pieces and highlights the selected piece."""
-        for p in self.pieces:
-            pygame.draw.circle(self.screen, p["color"], p["pos"], p["radius"])
-            if p == self.selected_piece:
-                pygame.draw.circle(self.screen, self.LIME, p["pos"], p["radius"] + 3, 2)
+    def get_cell_index(self, x, y):
+        """Returns the index of the grid cell under a point, or None."""
+        if (
+            self.grid_x <= x <= self.grid_x + self.grid_size
+            and self.grid_y <= y <= self.grid_y + self.grid_size
+        ):
+            col = min(int(x - self.grid_x) // self.cell_size, 2)
+            row = min(int(y - self.grid_y) // self.cell_size, 2)
+            return row * 3 + col
+        return None
+
+    def get_cell_center(self, cell):
+        """Returns the pixel centre of a grid cell."""
+        row, col = divmod(cell, 3)
+        return (self.grid_x + col * self.cell_size + self.cell_size // 2,
+                self.grid_y + row * self.cell_size + self.cell_size // 2)
 
     def get_grid_cell(self, x, y):
         """
         Snaps a position to the nearest grid cell and returns the cell center 
         and the stack of pieces at that cell.
         """
-        if (
-            self.grid_x <= x <= self.grid_x + self.grid_size
-            and self.grid_y <= y <= self.grid_y + self.grid_size
-        ):
-            col = (x - self.grid_x) // self.cell_size
-            row = (y - self.grid_y) // self.cell_size
-            grid_pos = (self.grid_x + col * self.cell_size + self.cell_size // 2,
-                        self.grid_y + row * self.cell_size + self.cell_size // 2)
-            stk = [p for p in self.pieces if tuple(p["pos"]) == grid_pos]
-            return grid_pos, stk
+        cell = self.get_cell_index(x, y)
+        if cell is not None:
+            return self.get_cell_center(cell), self.cells[cell]
         return None, []
 
     def check_board_win(self):
@@ -134,117 +169,597 @@ class GobbletGame:
         Returns a set of winning colors if there is a win on the board,
         otherwise returns None.
         """
-        board = [[None for _ in range(3)] for _ in range(3)]
-        for row in range(3):
-            for col in range(3):
-                cell_center = (self.grid_x + col * self.cell_size + self.cell_size // 2,
-                               self.grid_y + row * self.cell_size + self.cell_size // 2)
-                cell_stack = [p for p in self.pieces if tuple(p["pos"]) == cell_center]
-                if cell_stack:
-                    board[row][col] = cell_stack[-1]["color"]
-        winning_colors = set()
-        for row in board:
-            if row[0] and row[0] == row[1] == row[2]:
-                winning_colors.add(row[0])
-        for col in range(3):
-            if board[0][col] and board[0][col] == board[1][col] == board[2][col]:
-                winning_colors.add(board[0][col])
-        if board[0][0] and board[0][0] == board[1][1] == board[2][2]:
-            winning_colors.add(board[0][0])
-        if board[0][2] and board[0][2] == board[1][1] == board[2][0]:
-            winning_colors.add(board[0][2])
+        winning_colors = self.position.winners()
         return winning_colors if winning_colors else None
 
-    def handle_game_over_display(self):
-        """Displays the game over screen"""
-        over_font = pygame.font.Font(None, 50)
-        winner_font = pygame.font.Font(None, 52)
-        prompt_font = pygame.font.Font(None, 56)
-        line1 = over_font.render("Game Over!", True, self.PURPLE)
-        varx = self.BLUE if self.winner == self.BLUE else self.PINK
-        line2 = winner_font.render(
-            f"Winner: {'Player 1' if self.winner == self.BLUE else 'Player 2'}", True, varx)
-        line3 = prompt_font.render("Press R to restart the game", True, self.LIME)
-        total_height = line1.get_height() + line2.get_height() + line3.get_height() + 20
-        start_y = self.window_height // 2 - total_height // 2
-        self.screen.blit(line1, (self.window_width // 2 - line1.get_width() // 2, start_y))
-        self.screen.blit(line2, (self.window_width // 2 - line2.get_width() // 2,
-                            start_y + line1.get_height() + 30))
-        self.screen.blit(line3, (self.window_width // 2 - line3.get_width() // 2,
-                            start_y + line1.get_height() + line2.get_height() + 70))
-
-    def handle_piece_selection(self, mx, my):
+    def _handle_piece_selection(self, mx, my):
         """Handle selecting a piece"""
         for piece in self.pieces:
-            px, py = piece["pos"]
-            if (mx - px) ** 2 + (my - py) ** 2 <= piece["radius"] ** 2:
-                _, stack = self.get_grid_cell(px, py)
-                if stack and stack[-1] != piece:
+            px, py = piece.pos
+            if (mx - px) ** 2 + (my - py) ** 2 <= self.RADII[piece.piece.size] ** 2:
+                if piece.cell is not None and self.cells[piece.cell][-1] is not piece:
                     continue
-                if ((self.turn == "BLUE" and piece["color"] == self.BLUE) or
-                    (self.turn == "PINK" and piece["color"] == self.PINK)):
+                if piece.piece.colour == self.position.turn:
                     self.selected_piece = piece
-                    piece["orig_pos"] = piece["pos"][:]
+                    piece.lift()
+                    self.renderer.invalidate(self.renderer.piece_rect(piece))
+                break
+
+    def move_piece(self, piece, src, dst):
+        """Moves a piece between cells and its reserve slot on screen."""
+        self.renderer.invalidate(self.renderer.piece_rect(piece))
+        if src == engine.RESERVE:
+            self.reserves[piece.piece.colour].remove(piece)
+        else:
+            self.cells[src].pop()
+        if dst == engine.RESERVE:
+            self.reserves[piece.piece.colour].append(piece)
+            piece.cell = None
+            piece.pos = piece.home[:]
+        else:
+            self.cells[dst].append(piece)
+            piece.cell = dst
+            piece.pos = list(self.get_cell_center(dst))
+        self.renderer.invalidate(self.renderer.piece_rect(piece))
+
+    def sync_state(self):
+        """Updates the turn, winner and hint after the position changed."""
+        if self.hint is not None:
+            self.hint = None
+            self.renderer.invalidate()
+        self.renderer.invalidate(self.renderer.turn_rect())
+        self.turn = self.position.turn.name
+        if self.position.is_terminal() != self.game_over:
+            self.renderer.invalidate()
+        self.winner = self.position.winner
+        self.game_over = self.position.is_terminal()
+
+    def apply_move(self, move, piece=None):
+        """Plays a legal move on the engine and moves its piece on screen."""
+        src, dst, size = move
+        piece = piece or self.find_piece(src, size)
+        self.game.make_move(move)
+        self.move_piece(piece, src, dst)
+        self.sync_state()
+
+    def _deselect(self):
+        """Drops the selection, redrawing the piece without its ring."""
+        if self.selected_piece is not None:
+            self.renderer.invalidate(self.renderer.piece_rect(self.selected_piece))
+        self.selected_piece = None
+
+    def undo_move(self):
+        """Takes back the last move, and the computer's reply before it."""
+        for _ in range(2):
+            move = self.game.unmake_move()
+            if move is None:
+                break
+            src, dst, _ = move
+            self.move_piece(self.cells[dst][-1], dst, src)
+            if self.position.turn != self.ai_colour:
+                break
+        self._deselect()
+        self.sync_state()
+
+    def redo_move(self):
+        """Replays an undone move, and the computer's reply after it."""
+        for _ in range(2):
+            if not self.game.future:
+                break
+            src, dst, size = self.game.future[-1]
+            piece = self.find_piece(src, size)
+            self.game.redo()
+            self.move_piece(piece, src, dst)
+            if self.position.turn != self.ai_colour or self.position.is_terminal():
                 break
+        self._deselect()
+        self.sync_state()
 
-    def handle_piece_placement(self, mx, my):
+    def _handle_piece_placement(self, mx, my):
         """Handle placing a selected piece"""
-        new_pos, stack = self.get_grid_cell(mx, my)
-        if new_pos:
-            # Enforce stacking rule: only place on an empty cell
-            # or on a piece that is smaller.
-            if stack and self.selected_piece["radius"] <= stack[-1]["radius"]:
-                # Invalid move: revert to original position.
-                self.selected_piece["pos"] = self.selected_piece.get(
-                    "orig_pos", self.selected_piece["pos"])
-            else:
-                self.selected_piece["pos"] = list(new_pos)
-                # To mark this piece as now on top, remove and re-append it.
-                if self.selected_piece in self.pieces:
-                    self.pieces.remove(self.selected_piece)
-                    self.pieces.append(self.selected_piece)
-                winning_colors = self.check_board_win()
-                if winning_colors:
-                    if len(winning_colors) == 1:
-                        self.winner = winning_colors.pop()
-                    else:
-                        self.winner = self.PINK if self.turn == "BLUE" else self.BLUE
-                    self.game_over = True
-                else:
-                    self.turn = "PINK" if self.turn == "BLUE" else "BLUE"
+        piece = self.selected_piece
+        dst = self.get_cell_index(mx, my)
+        src = engine.RESERVE if piece.cell is None else piece.cell
+        move = (src, dst, piece.piece.size)
+        if dst is not None and self.position.is_legal(move):
+            self.apply_move(move, piece)
         else:
-            # Tapped outside the grid: revert.
-            self.selected_piece["pos"] = self.selected_piece.get(
-                "orig_pos", self.selected_piece["pos"])
+            # Invalid move or tapped outside the grid: revert.
+            piece.revert()
+            self.renderer.invalidate(self.renderer.piece_rect(piece))
         self.selected_piece = None
 
+    def open_log(self, log, index=0):
+        """Switches to replaying the games of a GameLog; returns the ReplayView."""
+        self.replay = ReplayView(self, log, index)
+        return self.replay
+
+    def show_position(self, pos):
+        """Lays the pieces out for a position, moving only those on changed cells."""
+        self.game = engine.Game(pos)
+        self.position = pos
+        invalidate, piece_rect = self.renderer.invalidate, self.renderer.piece_rect
+        spare = {piece: [] for pieces in engine.PIECES for piece in pieces}
+        for reserve in self.reserves.values():
+            for p in reserve:
+                spare[p.piece].append(p)
+        changed = [cell for cell in engine.CELLS
+                   if [p.piece for p in self.cells[cell]] != pos.stack(cell)]
+        for cell in changed:
+            for p in self.cells[cell]:
+                invalidate(piece_rect(p))
+                p.cell = None
+                spare[p.piece].append(p)
+            self.cells[cell] = []
+        for cell in changed:
+            for piece in pos.stack(cell):
+                p = spare[piece].pop()
+                invalidate(piece_rect(p))
+                p.cell = cell
+                p.pos = list(self.get_cell_center(cell))
+                self.cells[cell].append(p)
+                invalidate(piece_rect(p))
+        for p in self.pieces:
+            if p.cell is None and p.pos != p.home:
+                invalidate(piece_rect(p))
+                p.pos = p.home[:]
+                invalidate(piece_rect(p))
+        self.reserves = {colour: [p for p in self.pieces
+                                  if p.cell is None and p.piece.colour == colour]
+                         for colour in engine.COLOURS}
+
+    def play_ai_move(self):
+        """Lets the computer move when it is its turn."""
+        if not self.game_over and self.position.turn == self.ai_colour:
+            self.apply_move(self.ai_player.choose(self.position))
+
+    def enable_profiling(self, profiler):
+        """
+        Times the hot paths through a Profiler. F3 toggles a percentile
+        overlay and F9 starts or stops a cProfile run.
+        """
+        self.profiling = ProfilingHooks(self, profiler)
+        return self.profiling
+
+    def handle_key(self, key):
+        """U undoes, Y redoes, R restarts a finished game and H shows a hint."""
+        if self.profiling is not None and self.profiling.handle_key(key):
+            return
+        if self.replay is not None:
+            self.replay.handle_key(key)
+            return
+        if key == pygame.K_u:
+            self.undo_move()
+        elif key == pygame.K_y:
+            self.redo_move()
+        elif key == pygame.K_r and self.game_over:
+            self.reset_game()
+        elif key == pygame.K_h and not self.game_over:
+            self.show_hint()
+
     def run(self):
         """Main game loop"""
         running = True
         while running:
-            self.screen.fill(self.WHITE)
-            if self.game_over:
-                self.handle_game_over_display()
-            else:
-                self.draw_grid()
-                self.write_text()
-                self.draw_pieces()
-            pygame.display.flip()
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
+            self.renderer.render()
+            self.clock.tick(self.FPS)
+            if (self.replay is None and not self.game_over
+                    and self.position.turn == self.ai_colour):
+                self.play_ai_move()
+                continue
+            # Sleep until something happens instead of spinning on an idle board.
+            for event in [pygame.event.wait()] + pygame.event.get():
+                if not self.handle_event(event):
                     running = False
-                if self.game_over:
-                    if event.type == pygame.KEYDOWN and event.key == pygame.K_r:
-                        self.reset_game()
-                    continue
-                if event.type == pygame.MOUSEBUTTONDOWN:
-                    mx, my = pygame.mouse.get_pos()
-                    if self.selected_piece is None:
-                        self.handle_piece_selection(mx, my)
-                    else:
-                        self.handle_piece_placement(mx, my)
         pygame.quit()
 
-if __name__ == "__main__":
-    game = GobbletGame()
+    def handle_event(self, event):
+        """Handles one input event; returns False once the window is closed."""
+        if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+            self.renderer.invalidate()
+        if event.type == pygame.KEYDOWN:
+            self.handle_key(event.key)
+        if (event.type == pygame.MOUSEBUTTONDOWN and not self.game_over
+                and self.replay is None):
+            mx, my = event.pos
+            if self.selected_piece is None:
+                self._handle_piece_selection(mx, my)
+            else:
+                self._handle_piece_placement(mx, my)
+        return event.type != pygame.QUIT
+
+
+class Renderer:
+    """
+    Draws a GobbletGame to the window or an offscreen surface, redrawing
+    only the areas invalidated since the last frame, and reads frames back
+    for export.
+    """
+    WHITE = (255, 255, 255)
+    BLACK = (0, 0, 0)
+    BLUE = (0, 190, 255)
+    PINK = (255, 105, 180)
+    LIME = (50, 205, 50)
+    PURPLE = (128, 0, 128)
+    COLOURS = {engine.BLUE: BLUE, engine.PINK: PINK}
+    PROFILED = ("draw_scene", "draw_grid", "write_text", "draw_pieces", "draw_hint", "present")
+
+    def __init__(self, game, headless=False):
+        """Opens the window, or an offscreen surface if headless."""
+        self.game = game
+        self.headless = headless
+        size = (game.window_width, game.window_height)
+        if headless:
+            self.screen = pygame.Surface(size)
+        else:
+            pygame.display.init()
+            self.screen = pygame.display.set_mode(size)
+            pygame.display.set_caption("Gobblet Jr.")
+        self.texts = {}
+        self.sprites = {}
+        self.background = None
+        # The areas to redraw, or None for the whole window.
+        self.dirty = None
+
+    def invalidate(self, *rects):
+        """Marks screen areas for redrawing; no rects means the whole window."""
+        if not rects:
+            self.dirty = None
+        elif self.dirty is not None:
+            self.dirty.extend(rects)
+
+    def piece_rect(self, piece):
+        """Returns the screen area covered by a piece and its outlines."""
+        reach = self.game.RADII[piece.piece.size] + 8
+        x, y = piece.pos
+        return pygame.Rect(x - reach, y - reach, reach * 2, reach * 2)
+
+    def turn_rect(self):
+        """Returns the screen area of the turn text."""
+        return pygame.Rect(0, 10, self.game.window_width, 38)
+
+    def render_text(self, text, color, size=36):
+        """Returns a rendered text surface, reusing it while the text is unchanged."""
+        key = (text, color, size)
+        if key not in self.texts:
+            self.texts[key] = get_font(size).render(text, True, color)
+        return self.texts[key]
+
+    def get_sprite(self, piece, selected):
+        """Returns a pre-rendered piece surface, with the selection ring if selected."""
+        key = (piece, selected)
+        if key not in self.sprites:
+            color, radius = self.COLOURS[piece.colour], self.game.RADII[piece.size]
+            reach = radius + 4
+            sprite = pygame.Surface((reach * 2, reach * 2), pygame.SRCALPHA)
+            pygame.draw.circle(sprite, color, (reach, reach), radius)
+            if selected:
+                pygame.draw.circle(sprite, self.LIME, (reach, reach), radius + 3, 2)
+            self.sprites[key] = sprite if self.headless else sprite.convert_alpha()
+        return self.sprites[key]
+
+    def build_background(self):
+        """Pre-renders the grid and player names, which never change."""
+        game = self.game
+        background = pygame.Surface((game.window_width, game.window_height))
+        background.fill(self.WHITE)
+        for i in range(1, 3):
+            pygame.draw.line(
+                background, self.BLACK,
+                (game.grid_x + i * game.cell_size, game.grid_y),
+                (game.grid_x + i * game.cell_size, game.grid_y + game.grid_size),
+                5
+            )
+            pygame.draw.line(
+                background, self.BLACK,
+                (game.grid_x, game.grid_y + i * game.cell_size),
+                (game.grid_x + game.grid_size, game.grid_y + i * game.cell_size),
+                5
+            )
+        pygame.draw.rect(background, self.BLACK, (game.grid_x,
+                            game.grid_y, game.grid_size, game.grid_size), 5)
+        background.blit(self.render_text("Player 1", self.BLUE), (20, 50))
+        background.blit(self.render_text("Player 2", self.PINK), (game.window_width - 110, 50))
+        return background if self.headless else background.convert()
+
+    def draw_grid(self):
+        """Draws the 3x3 grid and player names from the pre-rendered background."""
+        if self.background is None:
+            self.background = self.build_background()
+        self.screen.blit(self.background, (0, 0))
+
+    def write_text(self):
+        """Displays the turn."""
+        game = self.game
+        if game.replay is None:
+            turn_text = self.render_text(f"Turn: {game.turn}", self.BLACK)
+            self.screen.blit(turn_text, (game.window_width // 2 - 50, 20))
+            return
+        turn_text = game.replay.label()
+        self.screen.blit(turn_text, ((game.window_width - turn_text.get_width()) // 2, 20))
+
+    def draw_pieces(self):
+        """Draws all pieces and highlights the selected piece."""
+        for p in self.drawing_order():
+            reach = self.game.RADII[p.piece.size] + 4
+            sprite = self.get_sprite(p.piece, p is self.game.selected_piece)
+            self.screen.blit(sprite, (p.pos[0] - reach, p.pos[1] - reach))
+
+    def drawing_order(self):
+        """Yields reserve pieces, then each cell's stack from bottom to top."""
+        for reserve in self.game.reserves.values():
+            yield from reserve
+        for stack in self.game.cells:
+            yield from stack
+
+    def draw_hint(self):
+        """Outlines the piece and the cell of the suggested move."""
+        game = self.game
+        if game.hint is None:
+            return
+        src, dst, size = game.hint
+        piece = game.find_piece(src, size)
+        if piece is not None:
+            pygame.draw.circle(self.screen, self.PURPLE, piece.pos,
+                               game.RADII[piece.piece.size] + 6, 3)
+        x, y = game.get_cell_center(dst)
+        half = game.cell_size // 2 - 6
+        pygame.draw.rect(self.screen, self.PURPLE, (x - half, y - half, half * 2, half * 2), 3)
+
+    def handle_game_over_display(self):
+        """Displays the game over screen"""
+        game = self.game
+        line1 = self.render_text("Game Over!", self.PURPLE, 50)
+        varx = self.COLOURS[game.winner]
+        line2 = self.render_text(
+            f"Winner: {'Player 1' if game.winner == engine.BLUE else 'Player 2'}", varx, 52)
+        line3 = self.render_text("Press R to restart the game", self.LIME, 56)
+        total_height = line1.get_height() + line2.get_height() + line3.get_height() + 20
+        start_y = game.window_height // 2 - total_height // 2
+        self.screen.blit(line1, (game.window_width // 2 - line1.get_width() // 2, start_y))
+        self.screen.blit(line2, (game.window_width // 2 - line2.get_width() // 2,
+                            start_y + line1.get_height() + 30))
+        self.screen.blit(line3, (game.window_width // 2 - line3.get_width() // 2,
+                            start_y + line1.get_height() + line2.get_height() + 70))
+
+    def draw_scene(self):
+        """Draws the whole scene, limited to the screen's clip area."""
+        if self.game.game_over and self.game.replay is None:
+            self.screen.fill(self.WHITE)
+            self.handle_game_over_display()
+        else:
+            self.draw_grid()
+            self.write_text()
+            self.draw_pieces()
+            self.draw_hint()
+
+    def present(self, rects=None):
+        """Shows the drawn frame on the display, or only the given areas of it."""
+        if self.headless:
+            return
+        if rects is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(rects)
+
+    def render(self):
+        """Redraws and presents only the areas invalidated since the last frame."""
+        if self.dirty is None:
+            self.draw_scene()
+            self.present()
+        elif self.dirty:
+            for rect in self.dirty:
+                self.screen.set_clip(rect)
+                self.draw_scene()
+            self.screen.set_clip(None)
+            self.present(self.dirty)
+        self.dirty = []
+
+    def frame(self, scale=1.0):
+        """Returns the current frame, shrunk by scale, for saving or encoding."""
+        self.render()
+        if scale == 1.0:
+            return self.screen
+        size = (round(self.game.window_width * scale), round(self.game.window_height * scale))
+        return pygame.transform.smoothscale(self.screen, size)
+
+    def frame_rgb(self, scale=1.0):
+        """Returns the current frame as raw RGB bytes, row by row."""
+        return pygame.image.tobytes(self.frame(scale), "RGB")
+
+    def save_frame(self, path, scale=1.0):
+        """Saves the current frame as an image; the format follows the extension."""
+        pygame.image.save(self.frame(scale), path)
+
+
+class ReplayView:
+    """Steps through the games of a GameLog on a GobbletGame."""
+
+    def __init__(self, game, log, index=0):
+        """Opens one game of a log, raising ValueError if the log is empty."""
+        if not log:
+            raise ValueError("the game log holds no games")
+        self.game = game
+        self.log = log
+        self.index = 0
+        self.replay = None
+        self.ply = 0
+        self.status = None
+        self.open(index)
+
+    def open(self, index):
+        """Shows one game of the log from its start; a corrupt game raises ValueError."""
+        index = min(max(index, 0), len(self.log) - 1)
+        self.replay = self.log[index]
+        self.index = index
+        self.ply = 0
+        self.game.reset_game()
+        self.game.sync_state()
+
+    def seek(self, ply):
+        """Shows the replayed game after ply moves."""
+        game = self.game
+        ply = min(max(ply, 0), len(self.replay))
+        if abs(ply - self.ply) >= KEYFRAME_EVERY:
+            game.show_position(self.replay.position_at(ply))
+            # Keep the moves the keyframe skipped, so stepping back can unmake them.
+            game.game.history.extend(self.replay.moves[:ply])
+            self.ply = ply
+        for move in self.replay.moves[self.ply:ply]:
+            game.apply_move(move)
+        for _ in range(self.ply - ply):
+            src, dst, _ = game.game.unmake_move()
+            game.move_piece(game.cells[dst][-1], dst, src)
+        self.ply = ply
+        game.sync_state()
+
+    def label(self):
+        """Returns the rendered status line, rendering it again only when it changes."""
+        game = self.game
+        status = f"{game.winner.name} wins" if game.game_over else f"Turn: {game.turn}"
+        text = f"Game {self.index + 1}  Ply {self.ply}/{len(self.replay)}  {status}"
+        # Every ply has its own status, so only the last one is kept instead of caching them all.
+        if self.status is None or self.status[0] != text:
+            self.status = (text, get_font(36).render(text, True, Renderer.BLACK))
+        return self.status[1]
+
+    def handle_key(self, key):
+        """Arrows step, Page Up/Down jump ten plies, Home/End go to either end, N/P change game."""
+        steps = {pygame.K_LEFT: -1, pygame.K_RIGHT: 1, pygame.K_PAGEUP: -10, pygame.K_PAGEDOWN: 10}
+        if key in steps:
+            self.seek(self.ply + steps[key])
+        elif key == pygame.K_HOME:
+            self.seek(0)
+        elif key == pygame.K_END:
+            self.seek(len(self.replay))
+        elif key in (pygame.K_n, pygame.K_p):
+            index = self.index + (1 if key == pygame.K_n else -1)
+            try:
+                self.open(index)
+            except ValueError as error:
+                # Stay on the game shown, which the failed open has not touched.
+                print(f"game {index + 1}: {error}")
+
+
+class ProfilingHooks:
+    """
+    Wraps a GobbletGame's hot paths with a Profiler and draws the timing
+    overlay once per frame, just before the frame is presented.
+    """
+    ROW_HEIGHT = 13
+    MAX_TEXTS = 512
+
+    def __init__(self, game, profiler):
+        """Instruments the game; nothing is wrapped unless this is created."""
+        self.game = game
+        self.profiler = profiler
+        self.show_overlay = False
+        self.texts = {}
+        self.overlay = (None, None)
+        renderer = game.renderer
+        profiler.instrument(game, game.PROFILED)
+        profiler.instrument(renderer, renderer.PROFILED)
+        profiler.instrument(self, ("draw_overlay",))
+        render, present = profiler.wrap("frame", renderer.render), renderer.present
+
+        def render_frame():
+            if self.show_overlay:
+                renderer.invalidate(self.overlay_rect())
+            render()
+            profiler.end_frame()
+
+        def present_with_overlay(rects=None):
+            # The overlay area is dirty every frame, so the board under it is already redrawn.
+            if self.show_overlay:
+                self.draw_overlay()
+            present(rects)
+        setattr(renderer, "render", render_frame)
+        setattr(renderer, "present", present_with_overlay)
+
+    def overlay_rect(self):
+        """Returns the screen area of the timing overlay, above the board."""
+        game = self.game
+        return pygame.Rect(game.grid_x - 40, 75, game.grid_size + 80, game.grid_y - 85)
+
+    def text(self, string):
+        """Returns a rendered overlay string, from a small cache of recent ones."""
+        if string not in self.texts:
+            if len(self.texts) >= self.MAX_TEXTS:
+                self.texts.clear()
+            self.texts[string] = get_font(18).render(string, True, Renderer.BLACK)
+        return self.texts[string]
+
+    def draw_overlay(self):
+        """Draws the p50/p95/p99 milliseconds of the slowest profiled sections."""
+        rect = self.overlay_rect()
+        rows = [("section", ("p50", "p95", "p99"))]
+        rows += [(name, tuple(f"{value:.2f}" for value in values))
+                 for name, values in self.profiler.rows()]
+        rows = tuple(rows[:rect.height // self.ROW_HEIGHT])
+        if rows != self.overlay[0]:
+            surface = pygame.Surface(rect.size)
+            surface.fill(Renderer.WHITE)
+            for row, (name, values) in enumerate(rows):
+                y = row * self.ROW_HEIGHT
+                surface.blit(self.text(name), (0, y))
+                for column, value in enumerate(values):
+                    text = self.text(value)
+                    surface.blit(text, (170 + column * 60 - text.get_width(), y))
+            self.overlay = (rows, surface)
+        self.game.renderer.screen.blit(self.overlay[1], rect)
+
+    def handle_key(self, key):
+        """Handles F3 and F9; returns True if the key was used."""
+        if key == pygame.K_F3:
+            self.show_overlay = not self.show_overlay
+            self.game.renderer.invalidate()
+            return True
+        if key == pygame.K_F9:
+            summary = self.profiler.toggle_cprofile()
+            print(summary or "cProfile started; press F9 again to write gobblet.prof")
+            return True
+        return False
+
+
+def main():
+    """Starts the game from the command line, importing optional features only when used."""
+    parser = argparse.ArgumentParser(description="Play Gobblet Jr.")
+    parser.add_argument("tablebase", nargs="?", help="tablebase file used for hints")
+    parser.add_argument("--ai", choices=["blue", "pink"], help="colour played by the computer")
+    parser.add_argument("--budget", type=int, default=1000, help="computer thinking time in ms")
+    parser.add_argument("--book", help="opening book used by the computer")
+    parser.add_argument("--book-min-games", type=int, default=10,
+                        help="ignore book moves tried in fewer games")
+    parser.add_argument("--replay", help="game record log to replay instead of playing")
+    parser.add_argument("--game", type=int, default=1, help="game of the log to open first")
+    parser.add_argument("--profile", action="store_true",
+                        help="time each frame; F3 shows the timings, F9 toggles cProfile")
+    args = parser.parse_args()
+    computer = AlphaBetaPlayer(args.budget)
+    if args.book:
+        from book import Book, BookPlayer
+        computer = BookPlayer(Book(args.book, args.book_min_games), computer)
+    tablebase = None
+    if args.tablebase:
+        from tablebase import Tablebase
+        tablebase = Tablebase(args.tablebase)
+    game = GobbletGame(
+        tablebase,
+        {"blue": engine.BLUE, "pink": engine.PINK}.get(args.ai),
+        computer,
+    )
+    if args.replay:
+        try:
+            game.open_log(GameLog(args.replay), args.game - 1)
+        except ValueError as error:
+            parser.error(f"{args.replay}: {error}")
+    if args.profile:
+        from profiler import Profiler
+        game.enable_profiling(Profiler())
     game.run()
+    if args.profile:
+        print("\n".join(game.profiling.profiler.report()))
+
+
+if __name__ == "__main__":
+    main()
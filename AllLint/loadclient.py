@@ -0,0 +1,71 @@
+"""
+Load generator for the game server.
+
+Opens many connections to server.py and has each of them play random
+legal moves in back-to-back games, then reports games and moves per
+second. Every client follows the game on its own engine Position.
+"""
+import asyncio
+import random
+import sys
+import time
+
+import engine
+import record
+from server import END, ERROR, MAX_PLIES, PLAY, PORT, START
+
+
+async def client(host, port, games, rng, totals):
+    """Plays a number of games on one connection."""
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(bytes((PLAY,)))
+    pos, colour, plies = None, None, 0
+    while games and (data := await reader.read(4096)):
+        for byte in data:
+            if byte == ERROR:
+                raise RuntimeError("server rejected a move")
+            if byte >= END:
+                totals["games"] += 1
+                games -= 1
+                if games:
+                    writer.write(bytes((PLAY,)))
+                continue
+            if byte >= START:
+                pos, colour, plies = engine.Position(), byte - START, 0
+            else:
+                pos.apply(record.decode_move(byte, pos))
+                plies += 1
+                totals["moves"] += 1
+            if pos.turn == colour and pos.winner is None and plies < MAX_PLIES:
+                writer.write(bytes((record.encode_move(rng.choice(pos.legal_moves())),)))
+        await writer.drain()
+    writer.close()
+
+
+async def run(host, port, connections, games):
+    """Runs the clients concurrently and returns the totals and elapsed time."""
+    totals = {"games": 0, "moves": 0}
+    rng = random.Random()
+    start = time.perf_counter()
+    await asyncio.gather(*(client(host, port, games, rng, totals)
+                           for _ in range(connections)))
+    return totals, time.perf_counter() - start
+
+
+def main():
+    """Prints the throughput of a load test against a running server."""
+    if len(sys.argv) < 2:
+        sys.exit("usage: python3 loadclient.py EVEN_CONNECTIONS [GAMES] [HOST] [PORT]")
+    connections = int(sys.argv[1])
+    games = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    host = sys.argv[3] if len(sys.argv) > 3 else "127.0.0.1"
+    port = int(sys.argv[4]) if len(sys.argv) > 4 else PORT
+    totals, elapsed = asyncio.run(run(host, port, connections, games))
+    # Every game is seen by both of its players.
+    games, moves = totals["games"] // 2, totals["moves"] // 2
+    print(f"{games} games  {moves} moves  {games / elapsed:.0f} games/s  "
+          f"{moves / elapsed:.0f} moves/s")
+
+
+if __name__ == "__main__":
+    main()
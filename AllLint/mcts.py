@@ -0,0 +1,125 @@
+"""
+Monte Carlo Tree Search player for Gobblet Jr.
+
+Runs UCT with random playouts on the headless engine. With more than one
+worker, each process grows its own tree from the same root and the visit
+counts of the root moves are summed (root parallelisation), so strength
+scales with the number of cores.
+"""
+import math
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import engine
+
+MAX_PLAYOUT_PLIES = 200
+
+
+class Node:
+    """A search tree node reached by playing move from its parent."""
+    __slots__ = ("move", "parent", "mover", "children", "untried", "visits", "score")
+
+    def __init__(self, pos, move=None, parent=None):
+        """Creates a node for the position reached by move."""
+        self.move = move
+        self.parent = parent
+        self.mover = engine.other(pos.turn)
+        self.children = []
+        self.untried = pos.legal_moves()
+        self.visits = 0
+        self.score = 0.0
+
+    def select(self, exploration):
+        """Returns the child with the best upper confidence bound."""
+        log_visits = math.log(self.visits)
+        return max(self.children, key=lambda child: child.score / child.visits
+                   + exploration * math.sqrt(log_visits / child.visits))
+
+    def update(self, winner):
+        """Records a playout result from the point of view of the mover."""
+        self.visits += 1
+        if winner is None:
+            self.score += 0.5
+        elif winner == self.mover:
+            self.score += 1.0
+
+
+def playout(pos, rng):
+    """Plays random moves to the end and returns the winner, or None."""
+    for _ in range(MAX_PLAYOUT_PLIES):
+        if pos.winner is not None:
+            break
+        pos.apply(rng.choice(pos.legal_moves()))
+    return pos.winner
+
+
+def search(key, iterations, exploration=1.4, seed=None):
+    """Grows a UCT tree from a packed position and returns root visit counts."""
+    rng = random.Random(seed)
+    root_pos = engine.Position.from_key(key)
+    root = Node(root_pos)
+    for _ in range(iterations):
+        node, pos = root, root_pos.copy()
+        while not node.untried and node.children:
+            node = node.select(exploration)
+            pos.apply(node.move)
+        if node.untried:
+            move = node.untried.pop(rng.randrange(len(node.untried)))
+            pos.apply(move)
+            child = Node(pos, move, node)
+            node.children.append(child)
+            node = child
+        winner = playout(pos, rng)
+        while node is not None:
+            node.update(winner)
+            node = node.parent
+    return {child.move: child.visits for child in root.children}
+
+
+class MCTSPlayer:
+    """Picks the most visited move after a fixed number of playouts."""
+
+    def __init__(self, iterations=2000, exploration=1.4, workers=1, seed=None):
+        """Splits the iterations over the given number of worker processes."""
+        self.iterations = iterations
+        self.exploration = exploration
+        self.workers = workers
+        self.rng = random.Random(seed)
+        self.executor = None
+
+    def visits(self, pos):
+        """Returns the merged root visit counts for a position."""
+        key = pos.key()
+        if self.workers <= 1:
+            return search(key, self.iterations, self.exploration, self.rng.random())
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(self.workers)
+        share = -(-self.iterations // self.workers)
+        seeds = [self.rng.random() for _ in range(self.workers)]
+        merged = {}
+        for counts in self.executor.map(search, [key] * self.workers, [share] * self.workers,
+                                        [self.exploration] * self.workers, seeds):
+            for move, count in counts.items():
+                merged[move] = merged.get(move, 0) + count
+        return merged
+
+    def choose(self, pos):
+        """Returns the most visited move, or None if the game is over."""
+        if pos.is_terminal():
+            return None
+        counts = self.visits(pos)
+        return max(counts, key=counts.get)
+
+    def close(self):
+        """Shuts down the worker pool."""
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+
+if __name__ == "__main__":
+    player = MCTSPlayer(int(sys.argv[1]) if len(sys.argv) > 1 else 2000,
+                        workers=int(sys.argv[2]) if len(sys.argv) > 2 else 1)
+    print(player.choose(engine.Position()))
+    player.close()
@@ -0,0 +1,99 @@
+"""
+Optional hot-path instrumentation.
+
+A Profiler replaces chosen methods of an object with timed wrappers and
+adds up their time per frame. end_frame pushes each total into a
+fixed-size ring buffer, so rolling percentiles over the last frames cost
+constant memory. Nothing is wrapped unless instrument is called, so an
+uninstrumented object runs at full speed. A cProfile run can also be
+started and stopped around any stretch of frames and dumped for pstats.
+"""
+import cProfile
+import io
+import pstats
+import time
+from array import array
+
+FRAMES = 240
+
+
+class RingBuffer:
+    """The last size values added, in a fixed-size array."""
+    __slots__ = ("values", "count")
+
+    def __init__(self, size=FRAMES):
+        """Allocates the buffer."""
+        self.values = array("d", bytes(8 * size))
+        self.count = 0
+
+    def add(self, value):
+        """Stores a value, overwriting the oldest once the buffer is full."""
+        self.values[self.count % len(self.values)] = value
+        self.count += 1
+
+    def percentile(self, percent):
+        """Returns a percentile of the stored values, 0.0 if there are none."""
+        stored = sorted(self.values[:min(self.count, len(self.values))])
+        if not stored:
+            return 0.0
+        return stored[min(len(stored) - 1, len(stored) * percent // 100)]
+
+
+class Profiler:
+    """Times wrapped methods per frame and keeps their rolling percentiles."""
+
+    def __init__(self, frames=FRAMES):
+        """Keeps timings for the last frames frames."""
+        self.frames = frames
+        self.timings = {}
+        self.current = {}
+        self.profile = None
+
+    def wrap(self, name, func):
+        """Returns func wrapped so its run time counts towards name."""
+        current = self.current
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                current[name] = current.get(name, 0.0) + time.perf_counter() - start
+        return timed
+
+    def instrument(self, obj, names):
+        """Replaces the named methods of obj with timed wrappers."""
+        for name in names:
+            setattr(obj, name, self.wrap(name, getattr(obj, name)))
+
+    def end_frame(self):
+        """Records the time of every section in the frame that just ended."""
+        for name, elapsed in self.current.items():
+            if name not in self.timings:
+                self.timings[name] = RingBuffer(self.frames)
+            self.timings[name].add(elapsed)
+        self.current.clear()
+
+    def rows(self, percents=(50, 95, 99)):
+        """Returns (name, percentiles in milliseconds) per section, slowest first."""
+        rows = [(name, tuple(ring.percentile(p) * 1000 for p in percents))
+                for name, ring in self.timings.items()]
+        return sorted(rows, key=lambda row: row[1], reverse=True)
+
+    def report(self, percents=(50, 95, 99)):
+        """Returns the rows as aligned text lines."""
+        return [f"{name:>15} " + " ".join(f"{value:6.2f}" for value in values)
+                for name, values in self.rows(percents)]
+
+    def toggle_cprofile(self, path="gobblet.prof"):
+        """Starts cProfile, or stops it, dumps the stats to path and returns a summary."""
+        if self.profile is None:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+            return None
+        self.profile.disable()
+        self.profile.dump_stats(path)
+        out = io.StringIO()
+        pstats.Stats(self.profile, stream=out).sort_stats("cumulative").print_stats(15)
+        self.profile = None
+        return out.getvalue()
@@ -0,0 +1,91 @@
+"""
+Binary move encoding and game records.
+
+A move fits in one byte: src * 9 + dst, where src is the cell a piece is
+taken from or 9 + size for a piece taken from the reserve, the same
+numbering batchsim.py uses. A board move does not store its size, since
+only the top piece of a cell can move; decoding it needs the position.
+
+A game record is a six-byte header (magic, piece set, result and move
+count) followed by one byte per move, so records can be concatenated
+into a log and skipped over without decoding their moves.
+"""
+import struct
+import sys
+
+import engine
+
+MAGIC = b"GJ"
+HEADER = struct.Struct("<2sBBH")
+MOVE_CODES = (engine.RESERVE + len(engine.SIZES)) * 9
+DRAW, UNFINISHED = 2, 3
+RESULT_NAMES = ("BLUE", "PINK", "DRAW", "UNFINISHED")
+
+
+def encode_move(move):
+    """Returns the one-byte code of a move."""
+    src, dst, size = move
+    if src == engine.RESERVE:
+        src += size
+    return src * 9 + dst
+
+
+def decode_move(code, pos):
+    """Returns the move a code stands for in a position, or None if it has no meaning there."""
+    src, dst = divmod(code, 9)
+    if src >= engine.RESERVE:
+        size = src - engine.RESERVE
+        return engine.MOVE[engine.RESERVE][dst][size] if size in engine.SIZES else None
+    top = pos.top(src)
+    return None if top is None else engine.MOVE[src][dst][top.size]
+
+
+def encode_game(codes, result):
+    """Packs move codes and a result into a game record."""
+    return HEADER.pack(MAGIC, engine.COPIES, result, len(codes)) + bytes(codes)
+
+
+def read_header(data, offset=0):
+    """Returns the (result, move count) of the record starting at offset."""
+    magic, copies, result, plies = HEADER.unpack_from(data, offset)
+    if magic != MAGIC:
+        raise ValueError(f"no game record at offset {offset}")
+    if copies != engine.COPIES:
+        raise ValueError("record was made with a different piece set")
+    return result, plies
+
+
+def iter_records(src):
+    """Yields (offset, result, codes) for each record in a binary file, one at a time."""
+    offset = 0
+    while True:
+        header = src.read(HEADER.size)
+        if not header:
+            return
+        if len(header) < HEADER.size:
+            raise ValueError(f"truncated record at offset {offset}")
+        result, plies = read_header(header)
+        codes = src.read(plies)
+        if len(codes) < plies:
+            raise ValueError(f"truncated record at offset {offset}")
+        yield offset, result, codes
+        offset += HEADER.size + plies
+
+
+def replay(codes, pos=None):
+    """Applies move codes to a position, yielding each move; raises ValueError if one is illegal."""
+    pos = pos or engine.Position()
+    for code in codes:
+        move = decode_move(code, pos)
+        if move is None or not pos.is_legal(move):
+            raise ValueError(f"illegal move code {code}")
+        pos.apply(move)
+        yield move
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("usage: python3 record.py GAMES_FILE")
+    with open(sys.argv[1], "rb") as games:
+        for start, outcome, moves in iter_records(games):
+            print(start, RESULT_NAMES[outcome], len(moves))
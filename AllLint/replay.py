@@ -0,0 +1,93 @@
+"""
+Random access to recorded games.
+
+A Replay decodes one game record into its moves and keeps a packed
+position key every KEYFRAME_EVERY plies, so the position at any ply is
+rebuilt from the nearest keyframe with at most KEYFRAME_EVERY - 1 moves
+instead of replaying the whole game. A GameLog maps a record log and
+indexes it by reading only the record headers, decoding a game when it
+is asked for, so long logs open without reading every game into memory.
+"""
+import mmap
+import os
+import sys
+from array import array
+
+import engine
+import record
+
+KEYFRAME_EVERY = 16
+
+
+class Replay:
+    """The moves of one recorded game plus periodic keyframes."""
+    __slots__ = ("moves", "keyframes", "result")
+
+    def __init__(self, codes, result=record.UNFINISHED):
+        """Decodes a game's move codes, raising ValueError on an illegal move."""
+        pos = engine.Position()
+        self.moves = []
+        self.keyframes = array("Q", [pos.key()])
+        self.result = result
+        for move in record.replay(codes, pos):
+            self.moves.append(move)
+            if not len(self.moves) % KEYFRAME_EVERY:
+                self.keyframes.append(pos.key())
+
+    def __len__(self):
+        """Returns the number of plies in the game."""
+        return len(self.moves)
+
+    def position_at(self, ply):
+        """Returns a new Position after the first ply moves."""
+        frame = ply // KEYFRAME_EVERY
+        pos = engine.Position.from_key(self.keyframes[frame])
+        for move in self.moves[frame * KEYFRAME_EVERY:ply]:
+            pos.apply(move)
+        return pos
+
+
+class GameLog:
+    """A record log on disk, indexed by the offset of each game."""
+
+    def __init__(self, path):
+        """Maps the log and scans its record headers, raising ValueError on a truncated one."""
+        with open(path, "rb") as src:
+            size = os.fstat(src.fileno()).st_size
+            self.data = mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.offsets = array("Q")
+        offset = 0
+        while offset < size:
+            if offset + record.HEADER.size > size:
+                raise ValueError(f"truncated record at offset {offset}")
+            end = offset + record.HEADER.size + record.read_header(self.data, offset)[1]
+            if end > size:
+                raise ValueError(f"truncated record at offset {offset}")
+            self.offsets.append(offset)
+            offset = end
+
+    def __len__(self):
+        """Returns the number of games in the log."""
+        return len(self.offsets)
+
+    def __getitem__(self, index):
+        """Reads and decodes one game."""
+        offset = self.offsets[index]
+        result, plies = record.read_header(self.data, offset)
+        start = offset + record.HEADER.size
+        return Replay(self.data[start:start + plies], result)
+
+    def close(self):
+        """Releases the mapping."""
+        if self.data:
+            self.data.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python3 replay.py GAMES_FILE INDEX")
+    log = GameLog(sys.argv[1])
+    game = log[int(sys.argv[2])]
+    for number in range(len(game) + 1):
+        print(number, game.position_at(number).key())
+    log.close()
@@ -0,0 +1,155 @@
+"""
+Streaming self-play dataset generator.
+
+Plays games between two players on a pool of worker processes and
+appends one (position, move, outcome) sample per ply to a binary file.
+The file is a sequence of chunks, each a small header followed by
+fixed-size samples: the packed position key, the one-byte move code of
+record.py and the outcome for the side to move (solver.WIN, LOSS or
+DRAW). Chunks are written as soon as a worker finishes them, so memory
+use does not grow with the number of games and an interrupted run
+keeps every complete chunk: appending to a dataset first cuts off a
+chunk left half-written by a crash.
+"""
+import argparse
+import os
+import random
+import struct
+from multiprocessing import Pool
+
+import engine
+import record
+from agents import make_agent
+from solver import DRAW, LOSS, WIN
+
+MAGIC = b"GJSP"
+CHUNK_HEADER = struct.Struct("<4sI")
+SAMPLE = struct.Struct("<QBB")
+MAX_PLIES = 200
+
+
+def play_game(blue, pink, rng, random_plies=0):
+    """Plays one game and returns its winner (None for a draw) and (key, code) pairs."""
+    pos = engine.Position()
+    players = (blue, pink)
+    plies = []
+    while pos.winner is None and len(plies) < MAX_PLIES:
+        if len(plies) < random_plies:
+            move = rng.choice(pos.legal_moves())
+        else:
+            move = players[pos.turn].choose(pos)
+        plies.append((pos.key(), record.encode_move(move)))
+        pos.apply(move)
+    return pos.winner, plies
+
+
+def samples(winner, plies):
+    """Yields packed samples labelled from the point of view of the side to move."""
+    for key, code in plies:
+        if winner is None:
+            outcome = DRAW
+        else:
+            outcome = WIN if winner == key & 1 else LOSS
+        yield SAMPLE.pack(key, code, outcome)
+
+
+def play_chunk(task):
+    """Plays the games of one chunk in a worker and returns the packed chunk."""
+    blue_spec, pink_spec, games, random_plies, seed = task
+    rng = random.Random(seed)
+    blue = make_agent(blue_spec, rng.random())
+    pink = make_agent(pink_spec, rng.random())
+    body = bytearray()
+    for _ in range(games):
+        body += b"".join(samples(*play_game(blue, pink, rng, random_plies)))
+    blue.close()
+    pink.close()
+    return CHUNK_HEADER.pack(MAGIC, len(body) // SAMPLE.size) + body
+
+
+def tasks(args):
+    """Yields one task per chunk until the requested number of games is covered."""
+    rng = random.Random(args.seed)
+    for start in range(0, args.games, args.chunk):
+        yield (args.blue, args.pink, min(args.chunk, args.games - start),
+               args.random_plies, rng.random())
+
+
+def iter_chunks(src, path):
+    """Yields (offset, sample count) per chunk header; the chunk body is left to the caller."""
+    offset = 0
+    while header := src.read(CHUNK_HEADER.size):
+        if len(header) < CHUNK_HEADER.size:
+            raise ValueError(f"{path} ends in a truncated chunk at offset {offset}")
+        magic, count = CHUNK_HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a self-play dataset")
+        yield offset, count
+        offset += CHUNK_HEADER.size + count * SAMPLE.size
+
+
+def iter_samples(path):
+    """Yields (key, code, outcome) for each sample in a dataset, one chunk in memory at a time."""
+    with open(path, "rb") as src:
+        for offset, count in iter_chunks(src, path):
+            body = src.read(count * SAMPLE.size)
+            if len(body) < count * SAMPLE.size:
+                raise ValueError(f"{path} ends in a truncated chunk at offset {offset}")
+            yield from SAMPLE.iter_unpack(body)
+
+
+def complete_length(path):
+    """Returns the length of the complete chunks at the start of a dataset, 0 if it is missing."""
+    if not os.path.exists(path):
+        return 0
+    size = os.path.getsize(path)
+    with open(path, "rb") as src:
+        length = 0
+        try:
+            for offset, count in iter_chunks(src, path):
+                end = offset + CHUNK_HEADER.size + count * SAMPLE.size
+                if end > size:
+                    break
+                src.seek(end)
+                length = end
+        except ValueError:
+            # A crash can only cut the last chunk short; anything else is not a dataset.
+            if length + CHUNK_HEADER.size <= size:
+                raise
+    return length
+
+
+def append_chunks(path, chunks):
+    """Appends chunks to a dataset after dropping a truncated tail; returns the samples written."""
+    length = complete_length(path)
+    if os.path.exists(path):
+        os.truncate(path, length)
+    written = 0
+    with open(path, "ab") as out:
+        for chunk in chunks:
+            out.write(chunk)
+            out.flush()
+            written += CHUNK_HEADER.unpack_from(chunk)[1]
+    return written
+
+
+def main():
+    """Generates a dataset from the command line."""
+    parser = argparse.ArgumentParser(description="Stream self-play samples to a file.")
+    parser.add_argument("output", help="dataset file, appended to")
+    parser.add_argument("games", type=int, help="number of games to play")
+    parser.add_argument("--blue", default="random", help="blue player, e.g. greedy or mcts:500")
+    parser.add_argument("--pink", default="random", help="pink player")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes")
+    parser.add_argument("--chunk", type=int, default=1000, help="games per chunk")
+    parser.add_argument("--random-plies", type=int, default=2,
+                        help="random opening plies, so deterministic players vary")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    with Pool(args.workers) as pool:
+        written = append_chunks(args.output, pool.imap_unordered(play_chunk, tasks(args)))
+    print(f"{written} samples written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
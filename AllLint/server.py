@@ -0,0 +1,163 @@
+"""
+Asyncio server hosting many Gobblet Jr. games in one process.
+
+Clients speak a one-byte binary protocol over TCP (see record.py for the
+move codes). A client sends PLAY to join the queue and is paired with
+the next waiting client; both then receive START plus their colour.
+Move codes are checked against the headless engine before being echoed
+to both players, and a game ends with END plus its result, after which
+PLAY queues again. Each match only holds a Position, its two players and
+the move codes played, which can be appended to a game log.
+"""
+import asyncio
+import sys
+
+import engine
+import record
+
+MAX_PLIES = 200
+PORT = 8765
+PLAY = 0xFF
+START = 0xF0
+END = 0xF8
+ERROR = 0xFE
+
+
+class Player:
+    """One connected client and the match it is playing, if any."""
+    __slots__ = ("writer", "match", "colour")
+
+    def __init__(self, writer):
+        """Wraps the stream a client is connected on."""
+        self.writer = writer
+        self.match = None
+        self.colour = None
+
+    def send(self, byte):
+        """Queues a protocol byte for the client."""
+        self.writer.write(bytes((byte,)))
+
+    def leave(self):
+        """Detaches the player from its finished match."""
+        self.match = self.colour = None
+
+
+class Match:
+    """A game between two players, validated on the engine."""
+    __slots__ = ("position", "players", "codes", "log")
+
+    def __init__(self, blue, pink, log=None):
+        """Starts a game and tells both players their colour."""
+        self.position = engine.Position()
+        self.players = (blue, pink)
+        self.codes = bytearray()
+        self.log = log
+        for colour, player in zip(engine.COLOURS, self.players):
+            player.match, player.colour = self, colour
+            player.send(START + colour)
+
+    def broadcast(self, byte):
+        """Sends a byte to both players."""
+        for player in self.players:
+            player.send(byte)
+
+    def finish(self, result):
+        """Announces and logs the result and frees both players for a new game."""
+        self.broadcast(END + result)
+        if self.log is not None:
+            self.log.write(record.encode_game(self.codes, result))
+            # Flushed per game, so a crash or SIGTERM loses no finished game.
+            self.log.flush()
+        for player in self.players:
+            player.leave()
+
+    def play(self, player, code):
+        """Plays a move code for a player; returns True if it was legal."""
+        if player.colour != self.position.turn:
+            return False
+        move = record.decode_move(code, self.position)
+        if move is None or not self.position.is_legal(move):
+            return False
+        self.position.apply(move)
+        self.codes.append(code)
+        self.broadcast(code)
+        if self.position.winner is not None:
+            self.finish(self.position.winner)
+        elif len(self.codes) >= MAX_PLIES:
+            self.finish(record.DRAW)
+        return True
+
+    def forfeit(self, player):
+        """Ends the game in favour of the opponent of a player who left."""
+        self.finish(engine.other(player.colour))
+
+
+class Server:
+    """Pairs waiting clients into matches and relays their moves."""
+
+    def __init__(self, log=None):
+        """Creates an empty lobby; finished games are appended to log if given."""
+        self.waiting = None
+        self.log = log
+        self.started = 0
+
+    def join(self, player):
+        """Queues a player, starting a match if someone is already waiting."""
+        if self.waiting is None or self.waiting is player:
+            self.waiting = player
+            return
+        Match(self.waiting, player, self.log)
+        self.waiting = None
+        self.started += 1
+
+    def command(self, player, byte):
+        """Runs one client command; returns True if it was accepted."""
+        if byte == PLAY:
+            if player.match is not None:
+                return False
+            self.join(player)
+            return True
+        if byte < record.MOVE_CODES and player.match is not None:
+            return player.match.play(player, byte)
+        return False
+
+    async def handle(self, reader, writer):
+        """Serves one client connection until it closes."""
+        player = Player(writer)
+        try:
+            while data := await reader.read(4096):
+                for byte in data:
+                    if not self.command(player, byte):
+                        player.send(ERROR)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            if self.waiting is player:
+                self.waiting = None
+            if player.match is not None:
+                player.match.forfeit(player)
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=PORT):
+        """Accepts clients until cancelled."""
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    """Runs a server, optionally logging finished games to a file."""
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else PORT
+    try:
+        if len(sys.argv) > 2:
+            with open(sys.argv[2], "ab") as log:
+                asyncio.run(Server(log).serve(port=port))
+        else:
+            asyncio.run(Server().serve(port=port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Exhaustive Gobblet Jr. solver.
+
+Labels every position reachable from a root as a win, loss or draw for the
+side to move, together with the number of plies to the end of the game,
+and stores the table on disk so it only has to be computed once.
+
+Positions are ranked by the (blue, pink) mask pair of each size, and the
+solver keeps one status byte and one child counter per rank in
+bytearrays instead of dicts of Python ints. That takes two bytes per
+rank: about 3 MB with one copy of each size (GOBBLET_COPIES=1), but
+11 GB for the full game, whose hundreds of millions of canonical
+positions are out of reach for pure Python. solve() refuses piece sets
+whose tables would not fit in MAX_SLOTS.
+"""
+import sys
+import time
+from array import array
+from bisect import bisect_left
+
+import engine
+from symmetry import canonical
+
+DRAW, WIN, LOSS = 0, 1, 2
+MAGIC = b"GJRS"
+MAX_DEPTH = 63
+MAX_SLOTS = 1 << 30
+SEEN = 1
+PROGRESS_EVERY = 100000
+
+
+def _size_pairs():
+    """Returns every (blue, pink) mask pair allowed for a single size."""
+    small = [mask for mask in range(engine.FULL + 1)
+             if len(engine.CELLS_OF[mask]) <= engine.COPIES]
+    return [(blue, pink) for blue in small for pink in small if not blue & pink]
+
+
+SIZE_PAIRS = _size_pairs()
+SIZE_RANK = {pair: rank for rank, pair in enumerate(SIZE_PAIRS)}
+# Ranks per side to move; one copy gives 91 ** 3, the full game 1423 ** 3.
+RANKS = len(SIZE_PAIRS) ** len(engine.SIZES)
+
+
+def rank(key):
+    """Maps a packed position key, ignoring the side to move, to 0 .. RANKS - 1."""
+    index = 0
+    for size in reversed(engine.SIZES):
+        blue = key >> (1 + 9 * size) & engine.FULL
+        pink = key >> (1 + 9 * (3 + size)) & engine.FULL
+        index = index * len(SIZE_PAIRS) + SIZE_RANK[blue, pink]
+    return index
+
+
+def encode(outcome, depth):
+    """Packs an outcome and depth into one nonzero byte."""
+    if depth > MAX_DEPTH:
+        raise ValueError(f"depth {depth} does not fit in a table entry")
+    return (outcome + 1) << 6 | depth
+
+
+def decode(entry):
+    """Returns the (outcome, depth) packed by encode."""
+    return (entry >> 6) - 1, entry & MAX_DEPTH
+
+
+class Table:
+    """Solved positions as sorted canonical keys with one encoded byte each."""
+    __slots__ = ("keys", "values")
+
+    def __init__(self, keys, values):
+        """Wraps a sorted array of keys and the bytes of their results."""
+        self.keys = keys
+        self.values = values
+
+    def __len__(self):
+        """Returns the number of solved positions."""
+        return len(self.keys)
+
+    def get(self, key, default=None):
+        """Returns the (outcome, depth) of a canonical position key."""
+        index = bisect_left(self.keys, key)
+        if index < len(self.keys) and self.keys[index] == key:
+            return decode(self.values[index])
+        return default
+
+    def items(self):
+        """Yields (key, (outcome, depth)) in key order."""
+        for key, entry in zip(self.keys, self.values):
+            yield key, decode(entry)
+
+
+def _children(pos):
+    """Returns the canonical keys of every position one move ahead."""
+    children = set()
+    for move in pos.legal_moves():
+        pos.apply(move)
+        children.add(canonical(pos.key())[0])
+        pos.undo(move)
+    return children
+
+
+def _parents(pos):
+    """Returns the canonical keys of every position one move back."""
+    parents = set()
+    for move in pos.unmoves():
+        pos.undo(move)
+        parents.add(canonical(pos.key())[0])
+        pos.apply(move)
+    return parents
+
+
+def _slot(key):
+    """Returns the index of a position key in the solver's bytearrays."""
+    return rank(key) * 2 + (key & 1)
+
+
+def _progress(stage, count, start):
+    """Reports how far a stage of solve has got on stderr."""
+    print(f"{stage}: {count} positions, {time.perf_counter() - start:.0f} s", file=sys.stderr)
+
+
+def _enumerate(root_key, status, left, progress):
+    """
+    Marks every position reachable from a canonical root key and counts
+    its distinct children; returns the keys seen and the finished games.
+    """
+    start = time.perf_counter()
+    keys, finished = array("Q"), array("Q")
+    stack = array("Q", [root_key])
+    status[_slot(root_key)] = SEEN
+    while stack:
+        key = stack.pop()
+        keys.append(key)
+        if progress and not len(keys) % PROGRESS_EVERY:
+            _progress("enumerated", len(keys), start)
+        pos = engine.Position.from_key(key)
+        if pos.is_terminal():
+            status[_slot(key)] = encode(WIN if pos.winner == pos.turn else LOSS, 0)
+            finished.append(key)
+            continue
+        children = _children(pos)
+        # Symmetric moves reach the same class, so count distinct children.
+        left[_slot(key)] = len(children)
+        for child in children:
+            slot = _slot(child)
+            if not status[slot]:
+                status[slot] = SEEN
+                stack.append(child)
+    return keys, finished
+
+
+def _retrograde(resolved, status, left, progress):
+    """Resolves parents breadth-first from the resolved keys, appending to them."""
+    start = time.perf_counter()
+    for count, key in enumerate(resolved, 1):
+        if progress and not count % PROGRESS_EVERY:
+            _progress("resolved", count, start)
+        outcome, depth = decode(status[_slot(key)])
+        for parent in _parents(engine.Position.from_key(key)):
+            slot = _slot(parent)
+            if status[slot] != SEEN:
+                continue
+            if outcome == LOSS:
+                status[slot] = encode(WIN, depth + 1)
+                resolved.append(parent)
+            else:
+                left[slot] -= 1
+                if not left[slot]:
+                    status[slot] = encode(LOSS, depth + 1)
+                    resolved.append(parent)
+
+
+def solve(root=None, progress=False):
+    """
+    Returns a Table of every canonical position reachable from the root.
+
+    Only one position per symmetry class is stored. Positions are
+    enumerated forwards from the root, then resolved by retrograde
+    analysis from the finished games: a position is a win as soon as one
+    move reaches a lost position, and a loss once every move reaches a won
+    one. Positions never resolved can be played forever and are draws.
+    """
+    if 4 * RANKS > MAX_SLOTS:
+        raise MemoryError(f"solving {engine.COPIES} copies of each size needs "
+                          f"{4 * RANKS / 2 ** 30:.1f} GiB of tables; try GOBBLET_COPIES=1")
+    # status is 0 for unseen, SEEN while unresolved, then the encoded result.
+    status = bytearray(2 * RANKS)
+    left = bytearray(2 * RANKS)
+    keys, resolved = _enumerate(canonical((root or engine.Position()).key())[0],
+                                status, left, progress)
+    _retrograde(resolved, status, left, progress)
+    keys = array("Q", sorted(keys))
+    values = bytes(encode(DRAW, 0) if status[slot] == SEEN else status[slot]
+                   for slot in map(_slot, keys))
+    if progress:
+        print(f"solved {len(keys)} positions", file=sys.stderr)
+    return Table(keys, values)
+
+
+def best_move(pos, table):
+    """
+    Returns the perfect move for the side to move, or None if unknown.
+
+    Wins are taken by the shortest route, losses are drawn out as long as
+    possible and draws are preferred over both. Finished games are scored
+    directly, so the table need not store them.
+    """
+    best, best_score = None, None
+    for move in pos.legal_moves():
+        pos.apply(move)
+        if pos.is_terminal():
+            entry = (WIN if pos.winner == pos.turn else LOSS, 0)
+        else:
+            entry = table.get(canonical(pos.key())[0])
+        pos.undo(move)
+        if entry is None:
+            continue
+        outcome, depth = entry
+        if outcome == LOSS:
+            score = (2, -depth)
+        elif outcome == DRAW:
+            score = (1, 0)
+        else:
+            score = (0, depth)
+        if best_score is None or score > best_score:
+            best, best_score = move, score
+    return best
+
+
+def save(table, path):
+    """Writes a solved table to a binary file."""
+    with open(path, "wb") as out:
+        out.write(MAGIC)
+        out.write(engine.COPIES.to_bytes(4, "little"))
+        out.write(len(table).to_bytes(8, "little"))
+        table.keys.tofile(out)
+        out.write(table.values)
+
+
+def load(path):
+    """Reads a table written by save."""
+    with open(path, "rb") as src:
+        if src.read(4) != MAGIC:
+            raise ValueError(f"{path} is not a solver table")
+        if int.from_bytes(src.read(4), "little") != engine.COPIES:
+            raise ValueError(f"{path} was solved for a different piece set")
+        count = int.from_bytes(src.read(8), "little")
+        keys = array("Q")
+        keys.fromfile(src, count)
+        values = src.read(count)
+    return Table(keys, values)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("usage: GOBBLET_COPIES=1 python3 solver.py OUTPUT")
+    save(solve(progress=True), sys.argv[1])
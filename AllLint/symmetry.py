@@ -0,0 +1,65 @@
+"""
+Board symmetries for Gobblet Jr.
+
+The 3x3 board has eight rotations and reflections and every win line is
+mapped onto another win line by each of them, so symmetric positions
+share their outcome. canonical() maps a packed position key to the
+smallest key among its eight images so caches only store one of them.
+"""
+import engine
+
+
+def _permutations():
+    """Returns the eight cell permutations of the square, identity first."""
+    rotate = tuple((2 - cell % 3) * 3 + cell // 3 for cell in engine.CELLS)
+    mirror = tuple(cell - cell % 3 + 2 - cell % 3 for cell in engine.CELLS)
+    perms = [tuple(engine.CELLS)]
+    for _ in range(3):
+        perms.append(tuple(rotate[cell] for cell in perms[-1]))
+    perms.extend(tuple(mirror[cell] for cell in perm) for perm in perms[:4])
+    return tuple(perms)
+
+
+PERMUTATIONS = _permutations()
+INVERSE = tuple(
+    next(index for index, back in enumerate(PERMUTATIONS)
+         if all(back[perm[cell]] == cell for cell in engine.CELLS))
+    for perm in PERMUTATIONS
+)
+MASK_MAPS = tuple(
+    tuple(sum(1 << perm[cell] for cell in engine.CELLS_OF[mask])
+          for mask in range(engine.FULL + 1))
+    for perm in PERMUTATIONS
+)
+SHIFTS = tuple(1 + 9 * index for index in range(6))
+
+
+def transform(key, index):
+    """Applies one of the eight symmetries to a packed position key."""
+    table = MASK_MAPS[index]
+    out = key & 1
+    for shift in SHIFTS:
+        out |= table[key >> shift & engine.FULL] << shift
+    return out
+
+
+def canonical(key):
+    """
+    Returns (canonical key, symmetry index) for a packed position key.
+
+    transform(key, index) == canonical key; use INVERSE[index] to map
+    moves found for the canonical position back onto the real board.
+    """
+    best, best_index = key, 0
+    for index in range(1, len(PERMUTATIONS)):
+        image = transform(key, index)
+        if image < best:
+            best, best_index = image, index
+    return best, best_index
+
+
+def transform_move(move, index):
+    """Applies one of the eight symmetries to a (src, dst, size) move."""
+    src, dst, size = move
+    perm = PERMUTATIONS[index]
+    return (src if src == engine.RESERVE else perm[src], perm[dst], size)
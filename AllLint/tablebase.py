@@ -0,0 +1,99 @@
+"""
+Memory-mapped perfect-play tablebase.
+
+A tablebase file is a dense index over the solved canonical positions
+(see symmetry.py): for each side to move, the sorted 32-bit ranks of
+its positions, followed by one byte per position holding two bits of
+outcome and six bits of distance to the end. Finished games are not
+stored, as their outcome follows from the board. A lookup is a binary
+search on a read-only mmap that every process on a host shares through
+the page cache, so the file takes five bytes per position: about 0.9 MB
+for the one-copy variant.
+"""
+import mmap
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+
+import engine
+import solver
+from solver import DRAW, decode, rank
+from symmetry import canonical
+
+MAGIC = b"GJTB"
+# Magic, copies of each size, then the number of positions for each side to move.
+HEADER = struct.Struct("<4sIQQ")
+
+
+def build(table, path):
+    """Writes a solver table out as a tablebase file; returns its size in bytes."""
+    entries = ([], [])
+    for key, (outcome, depth) in table.items():
+        if outcome != DRAW and not depth:
+            continue
+        entries[key & 1].append((rank(key), solver.encode(outcome, depth)))
+    for side in entries:
+        side.sort()
+    with open(path, "wb") as out:
+        out.write(HEADER.pack(MAGIC, engine.COPIES, *map(len, entries)))
+        for side in entries:
+            array("I", (position for position, _ in side)).tofile(out)
+        for side in entries:
+            out.write(bytes(entry for _, entry in side))
+        return out.tell()
+
+
+class Tablebase:
+    """Read-only view of a tablebase file, usable like a solver table."""
+
+    def __init__(self, path):
+        """Maps the tablebase file into memory."""
+        with open(path, "rb") as src:
+            magic, copies, *counts = HEADER.unpack(src.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a tablebase")
+            if copies != engine.COPIES:
+                raise ValueError(f"{path} was built for a different piece set")
+            self.data = mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self.data)
+        start = HEADER.size
+        self.ranks = []
+        for count in counts:
+            self.ranks.append(view[start:start + 4 * count].cast("I"))
+            start += 4 * count
+        self.values = []
+        for count in counts:
+            self.values.append(view[start:start + count])
+            start += count
+
+    def close(self):
+        """Releases the mapping."""
+        for view in self.ranks + self.values:
+            view.release()
+        self.data.close()
+
+    def get(self, key, default=None):
+        """Returns the (outcome, depth) stored for a canonical position key."""
+        ranks = self.ranks[key & 1]
+        position = rank(key)
+        index = bisect_left(ranks, position)
+        if index == len(ranks) or ranks[index] != position:
+            return default
+        return decode(self.values[key & 1][index])
+
+    def probe(self, pos):
+        """Returns the (outcome, depth) of a position, or None if unsolved."""
+        if pos.is_terminal():
+            return (solver.WIN if pos.winner == pos.turn else solver.LOSS), 0
+        return self.get(canonical(pos.key())[0])
+
+    def best_move(self, pos):
+        """Returns the perfect move for the side to move, or None."""
+        return solver.best_move(pos, self)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: GOBBLET_COPIES=1 python3 tablebase.py SOLVER_TABLE OUTPUT")
+    print(f"{build(solver.load(sys.argv[1]), sys.argv[2])} bytes")
@@ -0,0 +1,224 @@
+"""
+Checks for the rules engine against a naive stack-based reference.
+
+Run from this folder with python3 -m unittest test_engine (or pytest).
+"""
+import copy
+import random
+import unittest
+
+import engine
+from engine import BLUE, LARGE, MEDIUM, PINK, RESERVE, SMALL
+
+try:
+    import numpy as np
+
+    import batchsim
+except ImportError:
+    batchsim = None
+
+
+class Reference:
+    """The rules played out on plain lists of stacks, one (colour, size) per piece."""
+
+    def __init__(self):
+        """Starts with empty cells and every piece in reserve."""
+        self.stacks = [[] for _ in engine.CELLS]
+        self.reserves = {colour: [engine.COPIES] * 3 for colour in engine.COLOURS}
+        self.turn = BLUE
+        self.winner = None
+
+    def top(self, cell):
+        """Returns the visible piece of a cell, or None."""
+        return self.stacks[cell][-1] if self.stacks[cell] else None
+
+    def has_line(self, colour):
+        """Returns True if colour shows a whole line."""
+        return any(all(self.top(cell) is not None and self.top(cell)[0] == colour
+                       for cell in line) for line in engine.LINES)
+
+    def fits(self, cell, size):
+        """Returns True if a piece of size may cover the cell."""
+        return self.top(cell) is None or self.top(cell)[1] < size
+
+    def moves(self):
+        """Returns every legal (src, dst, size) move, sorted."""
+        if self.winner is not None:
+            return []
+        moves = [(RESERVE, dst, size) for size in engine.SIZES
+                 if self.reserves[self.turn][size] for dst in engine.CELLS
+                 if self.fits(dst, size)]
+        for src in engine.CELLS:
+            top = self.top(src)
+            if top is not None and top[0] == self.turn:
+                moves += [(src, dst, top[1]) for dst in engine.CELLS
+                          if dst != src and self.fits(dst, top[1])]
+        return sorted(moves)
+
+    def play(self, move):
+        """
+        Plays a move. A lift that uncovers an opponent line loses unless
+        the piece covers that line again; otherwise a line of the mover wins.
+        """
+        src, dst, size = move
+        opponent = engine.other(self.turn)
+        if src == RESERVE:
+            self.reserves[self.turn][size] -= 1
+        else:
+            self.stacks[src].pop()
+        exposed = src != RESERVE and self.has_line(opponent)
+        self.stacks[dst].append((self.turn, size))
+        if exposed and self.has_line(opponent):
+            self.winner = opponent
+        elif self.has_line(self.turn):
+            self.winner = self.turn
+        self.turn = opponent
+
+    def key(self):
+        """Packs the stacks like Position.key."""
+        key = self.turn
+        for cell, stack in enumerate(self.stacks):
+            for colour, size in stack:
+                key |= 1 << (1 + 9 * (colour * 3 + size) + cell)
+        return key
+
+
+def reference_perft(ref, depth):
+    """Counts move sequences of depth plies on the reference, copying at every move."""
+    if not depth:
+        return 1
+    total = 0
+    for move in ref.moves():
+        child = copy.deepcopy(ref)
+        child.play(move)
+        total += reference_perft(child, depth - 1)
+    return total
+
+
+def check_same(test, pos, ref):
+    """Asserts that an engine position and the reference agree everywhere."""
+    test.assertEqual(pos.key(), ref.key())
+    test.assertEqual(pos.turn, ref.turn)
+    test.assertEqual(pos.winner, ref.winner)
+    test.assertEqual(sorted(pos.legal_moves()), ref.moves())
+    for cell in engine.CELLS:
+        test.assertEqual([tuple(piece) for piece in pos.stack(cell)], ref.stacks[cell])
+    test.assertEqual([list(counts) for counts in pos.reserves],
+                     [ref.reserves[colour] for colour in engine.COLOURS])
+
+
+class EngineTest(unittest.TestCase):
+    """Random games played on the engine and the reference side by side."""
+
+    def test_random_games(self):
+        """Moves, winners, keys, undo and from_key match over random games."""
+        rng = random.Random(0)
+        for _ in range(300):
+            pos, ref, played = engine.Position(), Reference(), []
+            while ref.winner is None and len(played) < 60:
+                move = rng.choice(ref.moves())
+                pos.apply(move)
+                ref.play(move)
+                played.append(move)
+                check_same(self, pos, ref)
+                rebuilt = engine.Position.from_key(pos.key())
+                check_same(self, rebuilt, ref)
+                self.assertEqual(rebuilt.lines, pos.lines)
+            for move in reversed(played):
+                pos.undo(move)
+            self.assertEqual(pos.key(), engine.Position().key())
+            self.assertEqual(pos.lines, engine.Position().lines)
+
+    def test_lift_exposes_opponent_line(self):
+        """Uncovering an opponent line loses, even when the mover completes a line."""
+        for move, winner in (((2, 5, LARGE), PINK), ((2, 0, LARGE), None),
+                             ((RESERVE, 5, LARGE), BLUE)):
+            ref = Reference()
+            # Pink shows 0 and 1 and hides a medium at 2 under Blue's large; Blue holds 3 and 4.
+            ref.stacks[0] = [(PINK, SMALL)]
+            ref.stacks[1] = [(PINK, SMALL)]
+            ref.stacks[2] = [(PINK, MEDIUM), (BLUE, LARGE)]
+            ref.stacks[3] = [(BLUE, SMALL)]
+            ref.stacks[4] = [(BLUE, MEDIUM)]
+            ref.reserves = {BLUE: [1, 1, 1], PINK: [0, 1, 2]}
+            pos = engine.Position.from_key(ref.key())
+            check_same(self, pos, ref)
+            pos.apply(move)
+            ref.play(move)
+            self.assertEqual(pos.winner, winner)
+            check_same(self, pos, ref)
+
+
+class PerftTest(unittest.TestCase):
+    """Move counts from the initial position, pinned for the table-driven generator."""
+    COUNTS = (1, 27, 675, 20313, 572472)
+
+    def test_perft(self):
+        """perft matches the known counts up to four plies."""
+        for depth, count in enumerate(self.COUNTS):
+            self.assertEqual(engine.perft(engine.Position(), depth), count)
+
+    def test_reference_perft(self):
+        """The reference rules give the same counts up to three plies."""
+        for depth, count in enumerate(self.COUNTS[:4]):
+            self.assertEqual(reference_perft(Reference(), depth), count)
+
+    def test_reused_buffer(self):
+        """legal_moves(out) clears and refills the list it is given."""
+        pos = engine.Position()
+        out = [None] * 100
+        self.assertIs(pos.legal_moves(out), out)
+        self.assertEqual(out, pos.legal_moves())
+
+
+@unittest.skipIf(batchsim is None, "batchsim needs numpy")
+class BatchTest(unittest.TestCase):
+    """The NumPy batch simulator played against engine positions game by game."""
+
+    def test_random_games(self):
+        """Sampled moves are legal, and keys, winners and ply counts match the engine."""
+        batch = batchsim.Batch(300, seed=0)
+        positions = [engine.Position() for _ in range(300)]
+        sample, sampled = batch.sample, []
+
+        def recorded_sample():
+            sampled.append(sample())
+            return sampled[-1]
+        batch.sample = recorded_sample
+        for ply in range(1, 201):
+            ids = batch.ids.copy()
+            if not batch.step():
+                break
+            for game, src, dst, size in zip(ids, *map(np.ndarray.tolist, sampled.pop())):
+                self.assertIn((src, dst, size), positions[game].legal_moves())
+                positions[game].apply((src, dst, size))
+                if positions[game].winner is not None:
+                    self.assertEqual(batch.winner[game], positions[game].winner)
+                    self.assertEqual(batch.plies[game], ply)
+            self.assertEqual(batch.keys().tolist(),
+                             [positions[game].key() for game in batch.ids])
+        for game in batch.ids:
+            self.assertIsNone(positions[game].winner)
+            self.assertEqual(batch.winner[game], batchsim.EMPTY)
+
+    def test_uniform_sampling(self):
+        """Every legal move of a position is drawn about equally often."""
+        rng = random.Random(1)
+        pos = engine.Position()
+        for _ in range(7):
+            pos.apply(rng.choice(pos.legal_moves()))
+        batch = batchsim.Batch(50000, seed=1)
+        batch.masks[:] = np.array(pos.masks, dtype=np.int32)[:, None]
+        batch.turn[:] = bool(pos.turn)
+        counts = {}
+        for move in zip(*map(np.ndarray.tolist, batch.sample())):
+            counts[move] = counts.get(move, 0) + 1
+        legal = pos.legal_moves()
+        self.assertEqual(sorted(counts), sorted(legal))
+        expected = 50000 / len(legal)
+        for count in counts.values():
+            self.assertLess(abs(count - expected), expected * 0.2)
+
+
+if __name__ == "__main__":
+    unittest.main()
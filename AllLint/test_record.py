@@ -0,0 +1,77 @@
+"""
+Checks for the one-byte move codes and binary game records.
+
+Run from this folder with python3 -m unittest test_record (or pytest).
+"""
+import io
+import random
+import unittest
+
+import engine
+import record
+
+
+def random_game(rng, max_plies=60):
+    """Plays a random game; returns its moves and record result."""
+    pos, moves = engine.Position(), []
+    while pos.winner is None and len(moves) < max_plies:
+        moves.append(rng.choice(pos.legal_moves()))
+        pos.apply(moves[-1])
+    return moves, record.UNFINISHED if pos.winner is None else pos.winner
+
+
+class RecordTest(unittest.TestCase):
+    """Random engine games encoded, concatenated and read back."""
+
+    def setUp(self):
+        """Plays the games every test encodes."""
+        rng = random.Random(2)
+        self.games = [random_game(rng) for _ in range(200)]
+
+    def test_move_codes(self):
+        """Every legal move has its own code below MOVE_CODES, which decodes back to it."""
+        for moves, _ in self.games:
+            pos = engine.Position()
+            for move in moves:
+                codes = {}
+                for legal in pos.legal_moves():
+                    code = record.encode_move(legal)
+                    self.assertLess(code, record.MOVE_CODES)
+                    self.assertEqual(record.decode_move(code, pos), legal)
+                    codes[code] = legal
+                self.assertEqual(len(codes), len(pos.legal_moves()))
+                pos.apply(move)
+
+    def test_round_trip(self):
+        """A log of records reads back as the same games, offsets and results."""
+        data = b"".join(record.encode_game([record.encode_move(move) for move in moves], result)
+                        for moves, result in self.games)
+        offset = 0
+        records = list(record.iter_records(io.BytesIO(data)))
+        self.assertEqual(len(records), len(self.games))
+        for (start, result, codes), (moves, expected) in zip(records, self.games):
+            self.assertEqual((start, result), (offset, expected))
+            self.assertEqual(list(record.replay(codes)), moves)
+            offset += record.HEADER.size + len(moves)
+
+    def test_truncated_record(self):
+        """A record cut short anywhere is rejected."""
+        moves, result = self.games[0]
+        data = record.encode_game([record.encode_move(move) for move in moves], result)
+        for cut in range(1, len(data)):
+            with self.assertRaises(ValueError):
+                list(record.iter_records(io.BytesIO(data + data[:cut])))
+
+    def test_bad_records(self):
+        """A wrong magic and an illegal move code raise ValueError."""
+        with self.assertRaises(ValueError):
+            record.read_header(b"XX" + bytes(4))
+        # The second move takes a piece from a cell that is still empty.
+        codes = [record.encode_move((engine.RESERVE, 0, engine.SMALL)),
+                 record.encode_move((1, 2, engine.SMALL))]
+        with self.assertRaises(ValueError):
+            list(record.replay(codes))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+"""
+Checks for game logs and the replay viewer.
+
+Run from this folder with python3 -m unittest test_replay (or pytest).
+"""
+# pylint: disable=no-member,wrong-import-position
+import os
+import random
+import tempfile
+import unittest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import pygame
+
+import engine
+import record
+from gobbletfinal import GobbletGame
+from replay import GameLog
+
+
+def random_game(rng, max_plies=40):
+    """Plays a random game and returns its record."""
+    pos, codes = engine.Position(), []
+    while pos.winner is None and len(codes) < max_plies:
+        move = rng.choice(pos.legal_moves())
+        codes.append(record.encode_move(move))
+        pos.apply(move)
+    return record.encode_game(codes, record.UNFINISHED if pos.winner is None else pos.winner)
+
+
+class ReplayTest(unittest.TestCase):
+    """A log of random games, read whole, cut short and stepped through."""
+
+    def setUp(self):
+        """Writes a log of random games."""
+        rng = random.Random(3)
+        self.records = [random_game(rng) for _ in range(5)]
+        handle, self.path = tempfile.mkstemp()
+        with os.fdopen(handle, "wb") as out:
+            out.write(b"".join(self.records))
+
+    def tearDown(self):
+        """Removes the log."""
+        os.remove(self.path)
+
+    def test_truncated_log(self):
+        """A log cut inside a header or inside the moves is rejected."""
+        size = os.path.getsize(self.path)
+        for cut in (1, 3, len(self.records[-1]) - record.HEADER.size + 1):
+            with open(self.path, "r+b") as out:
+                out.truncate(size - cut)
+            with self.assertRaises(ValueError):
+                GameLog(self.path)
+
+    def test_seek_keeps_history(self):
+        """Stepping and jumping leaves the game history at the shown ply."""
+        log = GameLog(self.path)
+        game = GobbletGame(headless=True)
+        view = game.open_log(log)
+        rng = random.Random(4)
+        keys = [pygame.K_LEFT, pygame.K_RIGHT, pygame.K_PAGEUP, pygame.K_PAGEDOWN,
+                pygame.K_HOME, pygame.K_END]
+        for _ in range(300):
+            view.handle_key(rng.choice(keys))
+            self.assertEqual(game.game.history, view.replay.moves[:view.ply])
+            self.assertEqual(game.position.key(), view.replay.position_at(view.ply).key())
+        log.close()
+
+    def test_corrupt_game(self):
+        """Changing to a game that does not decode stays on the game shown."""
+        with open(self.path, "r+b") as out:
+            # The first move of the second game becomes a move from an empty cell.
+            out.seek(len(self.records[0]) + record.HEADER.size)
+            out.write(bytes([record.encode_move((0, 1, engine.SMALL))]))
+        log = GameLog(self.path)
+        view = GobbletGame(headless=True).open_log(log)
+        view.handle_key(pygame.K_RIGHT)
+        view.handle_key(pygame.K_n)
+        self.assertEqual((view.index, view.ply), (0, 1))
+        log.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
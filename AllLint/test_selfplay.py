@@ -0,0 +1,61 @@
+"""
+Checks for the self-play dataset format and its recovery after a crash.
+
+Run from this folder with python3 -m unittest test_selfplay (or pytest).
+"""
+import os
+import tempfile
+import unittest
+
+import selfplay
+
+
+class DatasetTest(unittest.TestCase):
+    """Datasets written chunk by chunk, cut short and appended to again."""
+
+    def setUp(self):
+        """Plays two small chunks of random games."""
+        self.chunks = [selfplay.play_chunk(("random", "random", 3, 2, seed)) for seed in (1, 2)]
+        handle, self.path = tempfile.mkstemp()
+        os.close(handle)
+        os.remove(self.path)
+
+    def tearDown(self):
+        """Removes the dataset."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def samples(self, chunks):
+        """Returns the samples packed in chunks."""
+        body = b"".join(chunk[selfplay.CHUNK_HEADER.size:] for chunk in chunks)
+        return list(selfplay.SAMPLE.iter_unpack(body))
+
+    def test_round_trip(self):
+        """Appended chunks read back as the samples they hold."""
+        written = selfplay.append_chunks(self.path, self.chunks)
+        self.assertEqual(written, len(self.samples(self.chunks)))
+        self.assertEqual(list(selfplay.iter_samples(self.path)), self.samples(self.chunks))
+
+    def test_truncated_chunk(self):
+        """A half-written chunk is rejected, and dropped before appending again."""
+        for cut in (7, len(self.chunks[1]) - 3):
+            selfplay.append_chunks(self.path, self.chunks)
+            os.truncate(self.path, os.path.getsize(self.path) - cut)
+            with self.assertRaises(ValueError):
+                list(selfplay.iter_samples(self.path))
+            selfplay.append_chunks(self.path, self.chunks[1:])
+            self.assertEqual(list(selfplay.iter_samples(self.path)),
+                             self.samples(self.chunks))
+            os.remove(self.path)
+
+    def test_not_a_dataset(self):
+        """A file that is not a dataset is never truncated."""
+        with open(self.path, "wb") as out:
+            out.write(b"not a self-play dataset")
+        with self.assertRaises(ValueError):
+            selfplay.append_chunks(self.path, self.chunks)
+        self.assertEqual(os.path.getsize(self.path), 23)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+"""
+Checks for the board symmetries and canonical keys.
+
+Run from this folder with python3 -m unittest test_symmetry (or pytest).
+"""
+import random
+import unittest
+
+import engine
+from engine import LINES
+from symmetry import INVERSE, PERMUTATIONS, canonical, transform, transform_move
+
+
+def random_positions(count, seed=0):
+    """Yields unfinished positions from random games."""
+    rng = random.Random(seed)
+    for _ in range(count):
+        pos = engine.Position()
+        for _ in range(rng.randrange(12)):
+            move = rng.choice(pos.legal_moves())
+            pos.apply(move)
+            if pos.winner is not None:
+                pos.undo(move)
+                break
+        yield pos
+
+
+class SymmetryTest(unittest.TestCase):
+    """The eight symmetries applied to random positions."""
+
+    def test_group(self):
+        """The permutations are distinct, map lines onto lines and have inverses."""
+        self.assertEqual(len(set(PERMUTATIONS)), 8)
+        for index, perm in enumerate(PERMUTATIONS):
+            self.assertEqual({tuple(sorted(perm[cell] for cell in line)) for line in LINES},
+                             {tuple(sorted(line)) for line in LINES})
+            back = PERMUTATIONS[INVERSE[index]]
+            self.assertEqual([back[perm[cell]] for cell in engine.CELLS], list(engine.CELLS))
+
+    def test_canonical(self):
+        """Symmetric positions share a canonical key, which maps back to the original."""
+        for pos in random_positions(300):
+            key = pos.key()
+            image, index = canonical(key)
+            self.assertEqual(transform(key, index), image)
+            self.assertEqual(transform(image, INVERSE[index]), key)
+            for other in range(len(PERMUTATIONS)):
+                self.assertEqual(canonical(transform(key, other))[0], image)
+                self.assertLessEqual(image, transform(key, other))
+
+    def test_moves(self):
+        """Legal moves map onto the image's legal moves, with the same outcome."""
+        for pos in random_positions(200, seed=1):
+            for index in range(len(PERMUTATIONS)):
+                image = engine.Position.from_key(transform(pos.key(), index))
+                moves = [transform_move(move, index) for move in pos.legal_moves()]
+                self.assertEqual(sorted(moves), sorted(image.legal_moves()))
+                for move, mapped in zip(pos.legal_moves(), moves):
+                    pos.apply(move)
+                    image.apply(mapped)
+                    self.assertEqual(transform(pos.key(), index), image.key())
+                    self.assertEqual(pos.winner, image.winner)
+                    image.undo(mapped)
+                    pos.undo(move)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,176 @@
+"""
+Round-robin tournaments between players.
+
+Every pair of players meets for the same number of games, split into
+small batches that alternate colours and run on a process pool. Each
+finished batch is appended to a JSON Lines file as one line, so after a
+crash the tournament is resumed by running it again: complete batches
+are read back and skipped. Ratings are fitted as Elo from all the games
+(Bradley-Terry, draws counting half), with confidence intervals from
+bootstrap resampling of the results.
+"""
+import json
+import math
+import os
+import random
+import sys
+from itertools import combinations
+from multiprocessing import Pool
+
+from agents import make_agent
+from selfplay import play_game
+
+RESAMPLES = 200
+ITERATIONS = 100
+
+
+def make_tasks(players, games, batch):
+    """Returns (task id, blue, pink, games) for every batch of the round robin."""
+    tasks = []
+    for first, second in combinations(players, 2):
+        for number, start in enumerate(range(0, games, batch)):
+            blue, pink = (first, second) if number % 2 == 0 else (second, first)
+            tasks.append((len(tasks), blue, pink, min(batch, games - start)))
+    return tasks
+
+
+def play_batch(job):
+    """Plays one batch in a worker and returns its result line."""
+    (task, blue_spec, pink_spec, games), random_plies, seed = job
+    rng = random.Random(f"{seed}-{task}")
+    blue = make_agent(blue_spec, rng.random())
+    pink = make_agent(pink_spec, rng.random())
+    winners, lengths = [], []
+    for _ in range(games):
+        winner, plies = play_game(blue, pink, rng, random_plies)
+        winners.append(None if winner is None else winner.name.lower())
+        lengths.append(len(plies))
+    blue.close()
+    pink.close()
+    return {"task": task, "blue": blue_spec, "pink": pink_spec,
+            "winners": winners, "plies": lengths}
+
+
+def read_results(path, config):
+    """Returns the complete result lines in a results file and the length they take up."""
+    if not os.path.exists(path):
+        return [], 0
+    with open(path, encoding="utf-8") as src:
+        lines = src.readlines()
+    # Only newline-terminated lines are complete; a crash can cut the last one short.
+    if not lines or not lines[0].endswith("\n"):
+        return [], 0
+    if json.loads(lines[0]) != {"config": config}:
+        raise ValueError(f"{path} holds a tournament with different settings")
+    results, length = [], len(lines[0])
+    for line in lines[1:]:
+        if not line.endswith("\n"):
+            break
+        results.append(json.loads(line))
+        length += len(line)
+    return results, length
+
+
+def pair_counts(results):
+    """Returns {(a, b): [a wins, draws, b wins]} with each pair stored once."""
+    counts = {}
+    for line in results:
+        for winner in line["winners"]:
+            players = sorted((line["blue"], line["pink"]))
+            entry = counts.setdefault(tuple(players), [0, 0, 0])
+            if winner is None:
+                entry[1] += 1
+            else:
+                entry[0 if line[winner] == players[0] else 2] += 1
+    return counts
+
+
+def records(player, counts):
+    """Yields (opponent, points, games) for every pair a player belongs to."""
+    for (first, second), (wins, draws, losses) in counts.items():
+        if player in (first, second):
+            won = wins if player == first else losses
+            yield second if player == first else first, won + draws / 2, wins + draws + losses
+
+
+def fit_elo(players, counts):
+    """
+    Fits Elo ratings averaging zero with minorization-maximization.
+
+    Every pair also gets one virtual draw, so a player that never scored
+    still has a finite rating.
+    """
+    counts = {pair: counts.get(pair, (0, 0, 0)) for pair in combinations(sorted(players), 2)}
+    strength = dict.fromkeys(players, 1.0)
+    for _ in range(ITERATIONS):
+        for player in players:
+            score, weight = 0.0, 0.0
+            for other, points, games in records(player, counts):
+                score += points + 0.5
+                weight += (games + 1) / (strength[player] + strength[other])
+            strength[player] = score / weight
+        scale = math.exp(sum(map(math.log, strength.values())) / len(players))
+        strength = {player: value / scale for player, value in strength.items()}
+    return {player: 400 * math.log10(value) for player, value in strength.items()}
+
+
+def resample(counts, rng):
+    """Returns pair counts redrawn with replacement from the observed games."""
+    redrawn = {}
+    for pair, entry in counts.items():
+        games = sum(entry)
+        drawn = rng.choices(range(3), weights=entry, k=games) if games else []
+        redrawn[pair] = [drawn.count(outcome) for outcome in range(3)]
+    return redrawn
+
+
+def standings(players, results, seed=None):
+    """Returns (player, games, score share, Elo, low, high) rows, best first."""
+    counts = pair_counts(results)
+    ratings = fit_elo(players, counts)
+    rng = random.Random(seed)
+    samples = [fit_elo(players, resample(counts, rng)) for _ in range(RESAMPLES)]
+    rows = []
+    for player in players:
+        score = sum(points for _, points, _ in records(player, counts))
+        games = sum(games for _, _, games in records(player, counts))
+        spread = sorted(sample[player] for sample in samples)
+        rows.append((player, games, score / games if games else 0.0, ratings[player],
+                     spread[int(RESAMPLES * 0.025)], spread[int(RESAMPLES * 0.975) - 1]))
+    return sorted(rows, key=lambda row: row[3], reverse=True)
+
+
+def run(config, path, workers=None):
+    """
+    Plays or resumes a tournament, appending batches to path, and returns
+    every result line. config holds the players, the games per pair, the
+    batch size, the random opening plies and the seed.
+    """
+    players = config["players"]
+    if len(set(players)) != len(players) or len(players) < 2:
+        raise ValueError("a tournament needs at least two different players")
+    results, length = read_results(path, config)
+    done = {line["task"] for line in results}
+    todo = [task for task in make_tasks(players, config["games"], config["batch"])
+            if task[0] not in done]
+    if length:
+        os.truncate(path, length)
+    with open(path, "a" if length else "w", encoding="utf-8") as out:
+        if not length:
+            out.write(json.dumps({"config": config}) + "\n")
+        with Pool(workers) as pool:
+            jobs = ((task, config["random_plies"], config["seed"]) for task in todo)
+            for number, line in enumerate(pool.imap_unordered(play_batch, jobs), 1):
+                out.write(json.dumps(line) + "\n")
+                out.flush()
+                results.append(line)
+                print(f"\r{number}/{len(todo)} batches", end="", file=sys.stderr)
+    print(file=sys.stderr)
+    return results
+
+
+def print_standings(rows):
+    """Prints a standings table."""
+    print(f"{'player':<20} {'games':>6} {'score':>6} {'elo':>7}  95% interval")
+    for player, games, score, elo, low, high in rows:
+        print(f"{player:<20} {games:>6} {score:>6.1%} {elo:>7.0f}  [{low:.0f}, {high:.0f}]")